@@ -0,0 +1,114 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, jwt_required
+
+from cache import response_cache
+from extensions import db
+from identity import identities
+from models import User
+from passwords import hasher
+
+bp = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+
+@bp.route('/register', methods=['POST'])
+def register():
+    data = request.get_json()
+    errors = {}
+    
+    
+    if not data.get('email') or '@' not in data['email']:
+        errors['email'] = 'Valid email is required'
+    if not data.get('username') or len(data['username']) < 3:
+        errors['username'] = 'Username must be at least 3 characters'
+    if not data.get('password') or len(data['password']) < 8:
+        errors['password'] = 'Password must be at least 8 characters'
+    if not data.get('full_name'):
+        errors['full_name'] = 'Full name is required'
+    
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({'error': 'Email already exists'}), 409
+    if User.query.filter_by(username=data['username']).first():
+        return jsonify({'error': 'Username already exists'}), 409
+    
+    user = User(
+        email=data['email'],
+        username=data['username'],
+        full_name=data['full_name'],
+        field_of_study=data.get('field_of_study', 'General Studies')
+    )
+    user.set_password(data['password'])
+    
+    db.session.add(user)
+    db.session.commit()
+    response_cache.bump('users')
+    
+    access_token = create_access_token(identity=user.id, additional_claims=identities.claims_for(user))
+    
+    return jsonify({
+        'message': 'User registered successfully',
+        'access_token': access_token,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'full_name': user.full_name
+        }
+    }), 201
+
+
+@bp.route('/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    user = User.query.filter_by(email=data.get('email')).first()
+    
+    if not user or not user.check_password(data.get('password')):
+        return jsonify({'error': 'Invalid credentials'}), 401
+    
+    # Hashes made under an older BCRYPT_LOG_ROUNDS are upgraded on login.
+    if hasher.needs_rehash(user.password_hash):
+        user.set_password(data['password'])
+        db.session.commit()
+    
+    access_token = create_access_token(identity=user.id, additional_claims=identities.claims_for(user))
+    refresh_token = create_refresh_token(identity=user.id)
+    
+    return jsonify({
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'full_name': user.full_name
+        }
+    })
+
+
+@bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    current_user = get_jwt_identity()
+    identity = identities.get(current_user)
+    if not identity:
+        return jsonify({'error': 'User not found'}), 404
+    new_token = create_access_token(identity=current_user, additional_claims=identities.claims_for(identity))
+    return jsonify({'access_token': new_token})
+
+
+@bp.route('/me', methods=['GET'])
+@jwt_required()
+def get_current_user():
+    user = identities.current()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify({
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'full_name': user.full_name,
+        'field_of_study': user.field_of_study
+    })
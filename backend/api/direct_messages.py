@@ -0,0 +1,144 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from conversations import conversation_key, increment_unread, mark_read, unread_counts
+from extensions import db
+from identity import identities
+from models import DirectMessage
+from pagination import get_limit
+from realtime import dm_channel, hub
+from serializers import DIRECT_MESSAGE, fetch, direct_messages, receivers, senders
+from writer import message_writer
+
+bp = Blueprint('direct_messages', __name__, url_prefix='/api/direct-messages')
+
+
+# A user id from a JSON body: an int, or a string of digits. None otherwise.
+def parse_user_id(value):
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        return None
+    return value
+
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def send_direct_message():
+    data = request.get_json()
+    errors = {}
+    
+    if not data.get('content') and not data.get('resource_id'):
+        errors['content'] = 'Message content or resource is required'
+    receiver_id = parse_user_id(data.get('receiver_id'))
+    if receiver_id is None:
+        errors['receiver_id'] = 'A valid receiver ID is required'
+    
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    receiver = identities.get(receiver_id)
+    if not receiver:
+        return jsonify({'error': 'Receiver not found'}), 404
+    
+    sender_id = get_jwt_identity()
+    values = {
+        'content': data.get('content', ''),
+        'sender_id': sender_id,
+        'receiver_id': receiver_id,
+        'conversation_key': conversation_key(sender_id, receiver_id),
+        'resource_id': data.get('resource_id')
+    }
+    
+    def insert():
+        message = DirectMessage(**values)
+        db.session.add(message)
+        increment_unread(message.receiver_id, message.sender_id)
+        db.session.flush()
+        return message.id, message.created_at, message.read
+    
+    # Possibly group-committed with other inserts; returns once durable.
+    message_id, created_at, read = message_writer.write(insert)
+    
+    hub.publish(dm_channel(values['sender_id'], values['receiver_id']), 'direct_message', {
+        'id': message_id,
+        'content': values['content'],
+        'sender_id': values['sender_id'],
+        'sender_username': identities.current().username,
+        'receiver_id': values['receiver_id'],
+        'receiver_username': receiver.username,
+        'resource_id': values['resource_id'],
+        'created_at': created_at.isoformat(),
+        'read': read
+    })
+    
+    return jsonify({
+        'message': 'Direct message sent',
+        'message_id': message_id
+    }), 201
+
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def get_direct_messages():
+    sender_id = request.args.get('sender_id', type=int)
+    receiver_id = request.args.get('receiver_id', type=int)
+    
+    if not sender_id or not receiver_id:
+        return jsonify({'error': 'Both sender and receiver IDs are required'}), 400
+    
+    since_id = request.args.get('since_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    limit = get_limit()
+    
+    stmt = DIRECT_MESSAGE.select().select_from(
+        direct_messages.join(senders, direct_messages.c.sender_id == senders.c.id).join(
+            receivers, direct_messages.c.receiver_id == receivers.c.id
+        )
+    ).where(direct_messages.c.conversation_key == conversation_key(sender_id, receiver_id))
+    
+    if since_id:
+        rows = fetch(stmt.where(direct_messages.c.id > since_id).order_by(
+            direct_messages.c.id.asc()
+        ).limit(limit))
+    else:
+        if before_id:
+            stmt = stmt.where(direct_messages.c.id < before_id)
+        rows = fetch(stmt.order_by(direct_messages.c.id.desc()).limit(limit))
+        rows.reverse()
+    
+    return jsonify(DIRECT_MESSAGE.many(rows))
+
+
+@bp.route('/unread', methods=['GET'])
+@jwt_required()
+def get_unread_direct_messages():
+    counts = unread_counts(get_jwt_identity())
+    return jsonify({
+        'total': sum(c.count for c in counts),
+        'peers': [{
+            'peer_id': c.peer_id,
+            'peer_username': c.username,
+            'unread': c.count
+        } for c in counts]
+    })
+
+
+@bp.route('/read', methods=['POST'])
+@jwt_required()
+def mark_direct_messages_read():
+    data = request.get_json()
+    
+    peer_id = parse_user_id(data.get('peer_id'))
+    if peer_id is None:
+        return jsonify({'errors': {'peer_id': 'A valid peer ID is required'}}), 400
+    if not identities.get(peer_id):
+        return jsonify({'error': 'Peer not found'}), 404
+    
+    marked = mark_read(get_jwt_identity(), peer_id)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Conversation marked as read',
+        'marked_read': marked
+    })
@@ -0,0 +1,134 @@
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from cache import response_cache
+from extensions import db
+from models import Group, GroupMember
+from pagination import InvalidCursor, decode_cursor, get_limit, paginate
+from serializers import GROUP, fetch, groups, users
+
+bp = Blueprint('groups', __name__, url_prefix='/api/groups')
+
+
+def group_directory_query():
+    return GROUP.select().select_from(
+        groups.join(users, groups.c.created_by == users.c.id)
+    )
+
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def create_group():
+    data = request.get_json()
+    errors = {}
+    
+    if not data.get('name'):
+        errors['name'] = 'Group name is required'
+    if not data.get('category'):
+        errors['category'] = 'Category is required'
+    
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    group = Group(
+        name=data['name'],
+        description=data.get('description', ''),
+        category=data['category'],
+        created_by=get_jwt_identity()
+    )
+    
+    db.session.add(group)
+    db.session.commit()
+    
+  
+    membership = GroupMember(
+        user_id=get_jwt_identity(),
+        group_id=group.id,
+        role='owner'
+    )
+    db.session.add(membership)
+    db.session.commit()
+    response_cache.bump('groups')
+    
+    return jsonify({
+        'message': 'Group created',
+        'group': {
+            'id': group.id,
+            'name': group.name
+        }
+    }), 201
+
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@response_cache.cached('groups', 'users')
+def get_groups():
+    limit = get_limit()
+    stmt = group_directory_query()
+    
+    category = request.args.get('category')
+    if category:
+        stmt = stmt.where(groups.c.category == category)
+    
+    after = request.args.get('after')
+    if after:
+        try:
+            created_at, group_id = decode_cursor(after, datetime, int)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        stmt = stmt.where(or_(
+            groups.c.created_at < created_at,
+            and_(groups.c.created_at == created_at, groups.c.id < group_id)
+        ))
+    
+    rows = fetch(stmt.order_by(
+        groups.c.created_at.desc(), groups.c.id.desc()
+    ).limit(limit + 1))
+    rows, next_cursor = paginate(rows, limit, key=lambda g: (g.created_at, g.id))
+    
+    return jsonify({
+        'groups': GROUP.many(rows),
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/<int:id>', methods=['GET'])
+@jwt_required()
+def get_group(id):
+    rows = fetch(group_directory_query().where(groups.c.id == id))
+    if not rows:
+        return jsonify({'error': 'Group not found'}), 404
+    return jsonify(GROUP.serialize(rows[0]))
+
+
+@bp.route('/<int:id>/members', methods=['POST', 'DELETE'])
+@jwt_required()
+def join_or_leave_group(id):
+    Group.query.get_or_404(id)
+    current_user_id = get_jwt_identity()
+    membership = GroupMember.query.filter_by(user_id=current_user_id, group_id=id).first()
+    
+    if request.method == 'POST':
+        if membership:
+            return jsonify({'error': 'Already a member'}), 409
+        db.session.add(GroupMember(user_id=current_user_id, group_id=id, role='member'))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent join for the same user.
+            db.session.rollback()
+            return jsonify({'error': 'Already a member'}), 409
+        response_cache.bump('groups')
+        return jsonify({'message': 'Joined group'}), 201
+    
+    elif request.method == 'DELETE':
+        if not membership:
+            return jsonify({'error': 'Not a member'}), 404
+        db.session.delete(membership)
+        db.session.commit()
+        response_cache.bump('groups')
+        return jsonify({'message': 'Left group'})
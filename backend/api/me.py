@@ -0,0 +1,73 @@
+import sqlalchemy as sa
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from extensions import db
+from serializers import MEMBER_GROUP, fetch, group_members, groups, messages, users
+
+bp = Blueprint('me', __name__, url_prefix='/api/me')
+
+
+@bp.route('/groups', methods=['GET'])
+@jwt_required()
+def get_my_groups():
+    # One query over the caller's memberships: unread counts come from the
+    # maintained counters and the preview from each group's last_message_id.
+    rows = fetch(
+        MEMBER_GROUP.select().select_from(
+            group_members.join(groups, groups.c.id == group_members.c.group_id).outerjoin(
+                messages, messages.c.id == groups.c.last_message_id
+            ).outerjoin(users, users.c.id == messages.c.user_id)
+        ).where(group_members.c.user_id == get_jwt_identity()).order_by(
+            sa.func.coalesce(groups.c.last_message_id, 0).desc(), groups.c.id
+        )
+    )
+    result = MEMBER_GROUP.many(rows)
+    return jsonify({
+        'total_unread': sum(group['unread'] for group in result),
+        'groups': result
+    })
+
+
+@bp.route('/groups/<int:id>/read', methods=['PUT'])
+@jwt_required()
+def advance_watermark(id):
+    # Marks the group read up to `message_id` (default: its newest message).
+    # The watermark only moves forward, so repeating or reordering these
+    # requests is harmless.
+    data = request.get_json(silent=True) or {}
+    connection = db.session.connection()
+    membership = connection.execute(
+        sa.select(group_members.c.id, group_members.c.last_read_seq, group_members.c.last_read_message_id,
+                  groups.c.message_count, groups.c.last_message_id)
+        .join(groups, groups.c.id == group_members.c.group_id)
+        .where(group_members.c.user_id == get_jwt_identity(), group_members.c.group_id == id)
+    ).first()
+    if not membership:
+        return jsonify({'error': 'Not a member'}), 404
+    
+    message_id = data.get('message_id')
+    if message_id is None:
+        message_id, seq = membership.last_message_id, membership.message_count
+    else:
+        seq = connection.scalar(
+            sa.select(messages.c.seq).where(messages.c.id == message_id, messages.c.group_id == id)
+        )
+        if seq is None:
+            return jsonify({'errors': {'message_id': 'Unknown message in this group'}}), 400
+    
+    advanced = connection.execute(
+        sa.update(group_members)
+        .where(group_members.c.id == membership.id, group_members.c.last_read_seq < seq)
+        .values(last_read_seq=seq, last_read_message_id=message_id)
+    ).rowcount > 0
+    db.session.commit()
+    
+    if not advanced:
+        seq, message_id = membership.last_read_seq, membership.last_read_message_id
+    return jsonify({
+        'group_id': id,
+        'advanced': advanced,
+        'last_read_message_id': message_id,
+        'unread': max(0, membership.message_count - seq)
+    })
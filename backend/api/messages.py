@@ -0,0 +1,137 @@
+import sqlalchemy as sa
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import and_, or_
+
+from extensions import db
+from identity import identities
+from models import Resource, Message
+from pagination import get_limit
+from realtime import dm_channel, group_channel, hub
+from serializers import GROUP_MESSAGE, fetch, messages, resources, users
+from writer import message_writer
+
+bp = Blueprint('messages', __name__, url_prefix='/api')
+
+
+@bp.route('/messages', methods=['POST'])
+@jwt_required()
+def send_message():
+    data = request.get_json()
+    errors = {}
+    
+    if not data.get('content') and not data.get('resource_id'):
+        errors['content'] = 'Message content or resource is required'
+    
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    values = {
+        'content': data.get('content', ''),
+        'user_id': get_jwt_identity(),
+        'group_id': data.get('group_id'),
+        'resource_id': data.get('resource_id')
+    }
+    
+    def insert():
+        message = Message(**values)
+        db.session.add(message)
+        db.session.flush()
+        return message.id, message.created_at
+    
+    # Possibly group-committed with other inserts; returns once durable.
+    message_id, created_at = message_writer.write(insert)
+    
+    if values['group_id']:
+        resource_title = db.session.query(Resource.title).filter_by(
+            id=values['resource_id']
+        ).scalar() if values['resource_id'] else None
+        hub.publish(group_channel(values['group_id']), 'message', {
+            'id': message_id,
+            'content': values['content'],
+            'sender': identities.current().username,
+            'resource_id': values['resource_id'],
+            'resource_title': resource_title,
+            'created_at': created_at.isoformat()
+        })
+    
+    return jsonify({
+        'message': 'Message sent',
+        'message_id': message_id
+    }), 201
+
+
+@bp.route('/messages', methods=['GET'])
+@jwt_required()
+def get_messages():
+    group_id = request.args.get('group_id', type=int)
+    
+    if not group_id:
+        return jsonify({'error': 'Group ID is required'}), 400
+    
+    since_id = request.args.get('since_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    limit = get_limit()
+    
+    stmt = GROUP_MESSAGE.select().select_from(
+        messages.join(users, messages.c.user_id == users.c.id).outerjoin(
+            resources, messages.c.resource_id == resources.c.id
+        )
+    ).where(messages.c.group_id == group_id)
+    
+    # Cursors are message ids; resolving them to (created_at, id) keeps the
+    # scan on the (group_id, created_at, id) index.
+    anchor_id = since_id or before_id
+    if anchor_id:
+        anchor = db.session.connection().execute(
+            sa.select(messages.c.created_at, messages.c.id).where(
+                messages.c.id == anchor_id, messages.c.group_id == group_id
+            )
+        ).first()
+        if not anchor:
+            return jsonify({'error': 'Unknown message cursor'}), 400
+    
+    if since_id:
+        stmt = stmt.where(or_(
+            messages.c.created_at > anchor.created_at,
+            and_(messages.c.created_at == anchor.created_at, messages.c.id > anchor.id)
+        ))
+        rows = fetch(stmt.order_by(messages.c.created_at.asc(), messages.c.id.asc()).limit(limit))
+    else:
+        if before_id:
+            stmt = stmt.where(or_(
+                messages.c.created_at < anchor.created_at,
+                and_(messages.c.created_at == anchor.created_at, messages.c.id < anchor.id)
+            ))
+        rows = fetch(stmt.order_by(messages.c.created_at.desc(), messages.c.id.desc()).limit(limit))
+        rows.reverse()
+    
+    return jsonify(GROUP_MESSAGE.many(rows))
+
+
+# EventSource cannot send headers, so this view alone also accepts ?jwt=;
+# everywhere else a token in the URL would end up in logs and Referers.
+@bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    group_id = request.args.get('group_id', type=int)
+    peer_id = request.args.get('peer_id', type=int)
+    
+    if group_id:
+        channel = group_channel(group_id)
+    elif peer_id:
+        channel = dm_channel(get_jwt_identity(), peer_id)
+    else:
+        return jsonify({'error': 'Group ID or peer ID is required'}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    
+    return Response(
+        stream_with_context(hub.stream(channel, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
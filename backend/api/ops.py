@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+
+from cache import response_cache
+from identity import identities
+from instrumentation import profiler
+from jobs import jobs
+from passwords import hasher
+from storage import storage
+from writer import message_writer
+
+bp = Blueprint('ops', __name__, url_prefix='/api')
+
+
+@bp.route('/_metrics', methods=['GET'])
+@jwt_required()
+def get_metrics():
+    return jsonify({
+        'password_hashing': hasher.stats(),
+        'identity_cache': identities.stats(),
+        'response_cache': response_cache.stats(),
+        'requests': profiler.stats(),
+        'jobs': jobs.stats(),
+        'storage': storage.stats(),
+        'message_writer': message_writer.stats()
+    })
@@ -0,0 +1,298 @@
+import os
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import and_, or_
+from werkzeug.utils import secure_filename
+
+from cache import response_cache
+from counters import download_counter
+from extensions import db
+from extraction import text_extractor
+from jobs import jobs
+from models import Resource, Blob
+from pagination import InvalidCursor, decode_cursor, encode_cursor, get_limit, paginate
+from search import search_resources
+from serializers import RESOURCE, fetch, resources, users
+from storage import storage
+
+# cli_group=None keeps `flask relocate-uploads` a top-level command.
+bp = Blueprint('resources', __name__, url_prefix='/api', cli_group=None)
+
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+def is_sha256(value):
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+def owns_content(file_hash):
+    return db.session.query(
+        Resource.query.filter_by(file_hash=file_hash, user_id=get_jwt_identity()).exists()
+    ).scalar()
+
+
+@bp.route('/resources', methods=['GET'])
+@jwt_required()
+@response_cache.cached('resources', 'users')
+def get_resources():
+    limit = get_limit()
+    stmt = RESOURCE.select().select_from(
+        resources.join(users, resources.c.user_id == users.c.id)
+    )
+
+    after = request.args.get('after')
+    if after:
+        try:
+            created_at, resource_id = decode_cursor(after, datetime, int)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        stmt = stmt.where(or_(
+            resources.c.created_at < created_at,
+            and_(resources.c.created_at == created_at, resources.c.id < resource_id)
+        ))
+
+    rows = fetch(stmt.order_by(
+        resources.c.created_at.desc(), resources.c.id.desc()
+    ).limit(limit + 1))
+    rows, next_cursor = paginate(rows, limit, key=lambda r: (r.created_at, r.id))
+
+    return jsonify({
+        'resources': RESOURCE.many(rows),
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/resources/search', methods=['GET'])
+@jwt_required()
+@response_cache.cached('resources', 'users')
+def search_resources_view():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search query is required'}), 400
+
+    limit = get_limit(default=20)
+    offset = 0
+    after = request.args.get('after')
+    if after:
+        try:
+            offset, = decode_cursor(after, int)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    rows = search_resources(
+        query,
+        category=request.args.get('category'),
+        uploader_id=request.args.get('uploader_id', type=int),
+        limit=limit + 1,
+        offset=offset
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return jsonify({
+        'resources': RESOURCE.many(rows),
+        'next_cursor': encode_cursor(offset + limit) if has_more else None
+    })
+
+
+@bp.route('/resources', methods=['POST'])
+@jwt_required()
+def upload_resource():
+    file_hash = request.form.get('sha256', '').lower()
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+            
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+            
+        filename = secure_filename(file.filename)
+        upload = file.stream
+        file_hash = upload.hexdigest()
+        file_size = upload.size
+    elif file_hash:
+        # Knowing a hash is no proof of holding the file, so only content the
+        # caller has published before can be referenced without re-sending
+        # it; anyone else's blob looks exactly like a missing one. Other
+        # uploads send the bytes and are deduplicated after hashing.
+        if not is_sha256(file_hash):
+            return jsonify({'error': 'A hex SHA-256 digest is required'}), 400
+        blob = db.session.get(Blob, file_hash)
+        if not blob or not owns_content(file_hash):
+            return jsonify({'error': 'Unknown content hash'}), 404
+            
+        filename = secure_filename(request.form.get('file_name', ''))
+        if not allowed_file(filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+        upload = None
+        file_size = blob.file_size
+    else:
+        return jsonify({'error': 'No file part'}), 400
+    
+    return publish_resource(upload, file_hash, file_size, filename, request.form)
+
+
+def publish_resource(upload, file_hash, file_size, filename, fields):
+    # Shared by single-request uploads and finalized upload sessions.
+    current_user_id = get_jwt_identity()
+    existing = Resource.query.filter_by(file_hash=file_hash, user_id=current_user_id).first()
+    if existing:
+        if upload:
+            upload.discard()
+        return jsonify({
+            'message': 'Resource already exists',
+            'resource': {
+                'id': existing.id,
+                'title': existing.title
+            }
+        }), 409
+    
+    created = storage.acquire(file_hash, file_size)
+    if upload:
+        file_path = storage.put(upload, file_hash, created)
+    elif created:
+        # The blob was deleted after the caller's probe; nothing holds the bytes.
+        db.session.rollback()
+        return jsonify({'error': 'Unknown content hash'}), 404
+    else:
+        file_path = storage.path(file_hash)
+    
+    resource = Resource(
+        title=fields.get('title', filename),
+        description=fields.get('description', ''),
+        category=fields.get('category', 'General'),
+        file_path=file_path,
+        file_name=filename,
+        file_size=file_size,
+        file_hash=file_hash,
+        user_id=current_user_id
+    )
+    
+    db.session.add(resource)
+    # Text extraction runs off the request path, in the same transaction.
+    text_extractor.enqueue(file_hash, filename)
+    db.session.commit()
+    response_cache.bump('resources')
+    # Extraction and, in chunked mode, chunking were queued above.
+    jobs.notify()
+    
+    return jsonify({
+        'message': 'Resource uploaded successfully',
+        'resource': {
+            'id': resource.id,
+            'title': resource.title,
+            'file_name': resource.file_name
+        }
+    }), 201
+
+
+@bp.route('/resources/probe', methods=['HEAD', 'POST'])
+@jwt_required()
+def probe_resource():
+    file_hash = request.args.get('sha256', '').lower()
+    if not is_sha256(file_hash):
+        return jsonify({'error': 'A hex SHA-256 digest is required'}), 400
+    
+    # Like publishing by hash, only the caller's own content is reported;
+    # otherwise the probe would confirm which files other users hold.
+    blob = db.session.get(Blob, file_hash)
+    own = db.session.query(Resource.id, Resource.title).filter_by(
+        file_hash=file_hash, user_id=get_jwt_identity()
+    ).first()
+    if not blob or not own:
+        return jsonify({'exists': False}), 404
+    
+    return jsonify({
+        'exists': True,
+        'file_size': blob.file_size,
+        'resource': {
+            'id': own.id,
+            'title': own.title
+        }
+    })
+
+
+@bp.route('/resources/<int:id>', methods=['GET'])
+@jwt_required()
+def get_resource(id):
+    resource = Resource.query.get_or_404(id)
+    download_counter.increment(resource.id)
+    
+    return jsonify({
+        'id': resource.id,
+        'title': resource.title,
+        'description': resource.description,
+        'category': resource.category,
+        'file_name': resource.file_name,
+        'file_size': resource.file_size,
+        'download_count': (resource.download_count or 0) + download_counter.pending(resource.id),
+        'uploader_id': resource.user_id,
+        'uploader': resource.uploader.username,
+        'created_at': resource.created_at.isoformat()
+    })
+
+
+@bp.route('/resources/<int:id>', methods=['PATCH', 'DELETE'])
+@jwt_required()
+def update_or_delete_resource(id):
+    resource = Resource.query.get_or_404(id)
+    current_user_id = get_jwt_identity()
+    
+   
+    if resource.user_id != current_user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    if request.method == 'PATCH':
+        data = request.get_json()
+      
+        if 'title' in data and len(data['title']) < 3:
+            return jsonify({'error': 'Title must be at least 3 characters'}), 400
+            
+        resource.title = data.get('title', resource.title)
+        resource.description = data.get('description', resource.description)
+        resource.category = data.get('category', resource.category)
+        
+        db.session.commit()
+        response_cache.bump('resources')
+        return jsonify({
+            'message': 'Resource updated',
+            'resource': {
+                'id': resource.id,
+                'title': resource.title
+            }
+        })
+    
+    elif request.method == 'DELETE':
+        orphaned = storage.release(resource.file_hash)
+        db.session.delete(resource)
+        db.session.commit()
+        response_cache.bump('resources')
+        # The blob goes only once no other resource references it.
+        if orphaned:
+            storage.remove(resource.file_hash, legacy_path=resource.file_path)
+        return jsonify({'message': 'Resource deleted'})
+
+
+@bp.route('/uploads/<int:id>')
+@jwt_required()
+def download_file(id):
+    resource = Resource.query.get_or_404(id)
+    return storage.send(resource)
+
+
+@bp.cli.command('relocate-uploads')
+def relocate_uploads():
+    moved = 0
+    for resource in Resource.query.all():
+        target = storage.path(resource.file_hash)
+        if resource.file_path != target and os.path.exists(resource.file_path):
+            storage.adopt(resource.file_path, resource.file_hash)
+            moved += 1
+        if os.path.exists(target):
+            resource.file_path = target
+    db.session.commit()
+    print(f'Moved {moved} files into the content store')
@@ -0,0 +1,162 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+
+from api.resources import allowed_file, is_sha256, publish_resource
+from extensions import db
+from models import UploadSession
+from resumable import IncompleteChunk, upload_sessions
+
+bp = Blueprint('upload_sessions', __name__, url_prefix='/api/upload-sessions', cli_group=None)
+
+
+def get_own_session(session_id):
+    session = db.session.get(UploadSession, session_id)
+    if session is None or session.user_id != get_jwt_identity():
+        return None
+    return session
+
+def session_to_dict(session):
+    return {
+        'id': session.id,
+        'file_name': session.file_name,
+        'file_size': session.file_size,
+        'chunk_size': session.chunk_size,
+        'chunk_count': upload_sessions.chunk_count(session),
+        'received': upload_sessions.received(session),
+        'hashed_offset': session.hashed_offset,
+        'updated_at': session.updated_at.isoformat()
+    }
+
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def create_upload_session():
+    data = request.get_json()
+    errors = {}
+
+    filename = secure_filename(data.get('file_name', ''))
+    if not allowed_file(filename):
+        errors['file_name'] = 'File type not allowed'
+    file_size = data.get('file_size')
+    if not isinstance(file_size, int) or file_size <= 0:
+        errors['file_size'] = 'File size must be a positive number of bytes'
+    file_hash = data.get('sha256', '').lower()
+    if file_hash and not is_sha256(file_hash):
+        errors['sha256'] = 'A hex SHA-256 digest is required'
+
+    if errors:
+        return jsonify({'errors': errors}), 400
+    if file_size > upload_sessions.max_size:
+        return jsonify({'error': f'Uploads are limited to {upload_sessions.max_size} bytes'}), 413
+    if upload_sessions.open_count(get_jwt_identity()) >= upload_sessions.per_user:
+        return jsonify({'error': 'Too many open upload sessions'}), 429
+
+    session = upload_sessions.create(
+        get_jwt_identity(),
+        filename,
+        file_size,
+        sha256=file_hash or None,
+        title=data.get('title'),
+        description=data.get('description'),
+        category=data.get('category')
+    )
+    db.session.commit()
+
+    return jsonify(session_to_dict(session)), 201
+
+
+@bp.route('/<session_id>', methods=['GET'])
+@jwt_required()
+def get_upload_session(session_id):
+    session = get_own_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    return jsonify(session_to_dict(session))
+
+
+@bp.route('/<session_id>/chunks/<int:index>', methods=['PUT'])
+@jwt_required()
+def put_chunk(session_id, index):
+    session = get_own_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    if index >= upload_sessions.chunk_count(session):
+        return jsonify({'error': 'Chunk index out of range'}), 400
+
+    offset = index * session.chunk_size
+    length = upload_sessions.chunk_length(session, index)
+    if request.content_length != length:
+        return jsonify({'error': f'Chunk {index} must be exactly {length} bytes'}), 400
+
+    # A retried chunk that already arrived is acknowledged, not rewritten.
+    if upload_sessions.has_chunk(session, index):
+        return jsonify({'index': index, 'offset': offset, 'hashed_offset': session.hashed_offset})
+
+    try:
+        staged = upload_sessions.write_chunk(session, index, request.stream)
+        db.session.commit()
+        upload_sessions.commit_digest(staged)
+    except IncompleteChunk as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        # The same chunk raced in through another request.
+        db.session.rollback()
+
+    db.session.refresh(session)
+    return jsonify({'index': index, 'offset': offset, 'hashed_offset': session.hashed_offset}), 201
+
+
+@bp.route('/<session_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload_session(session_id):
+    session = get_own_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+
+    fields = {
+        key: value for key, value in (
+            ('title', session.title),
+            ('description', session.description),
+            ('category', session.category)
+        ) if value is not None
+    }
+    filename, file_size, declared = session.file_name, session.file_size, session.sha256
+
+    finished = upload_sessions.finish(session)
+    if finished is None:
+        return jsonify({
+            'error': 'Upload is incomplete',
+            'received': upload_sessions.received(session)
+        }), 409
+
+    file_hash, upload = finished
+    if declared and declared != file_hash:
+        db.session.commit()
+        upload.discard()
+        return jsonify({'error': 'Uploaded content does not match the declared SHA-256'}), 400
+
+    response = publish_resource(upload, file_hash, file_size, filename, fields)
+    # A duplicate returns without committing; the session is gone either way.
+    db.session.commit()
+    return response
+
+
+@bp.route('/<session_id>', methods=['DELETE'])
+@jwt_required()
+def delete_upload_session(session_id):
+    session = get_own_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+
+    upload = upload_sessions.close(session)
+    db.session.commit()
+    upload.discard()
+    return jsonify({'message': 'Upload session deleted'})
+
+
+@bp.cli.command('purge-upload-sessions')
+def purge_upload_sessions():
+    print(f'Removed {upload_sessions.collect_expired()} abandoned upload sessions')
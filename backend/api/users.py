@@ -0,0 +1,55 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+from sqlalchemy import and_, func, or_
+
+from cache import response_cache
+from pagination import InvalidCursor, decode_cursor, get_limit, paginate
+from serializers import USER_SUMMARY, fetch, users
+
+bp = Blueprint('users', __name__, url_prefix='/api/users')
+
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@response_cache.cached('users')
+def get_users():
+    limit = get_limit(default=20, maximum=100)
+    username = func.lower(users.c.username)
+    stmt = USER_SUMMARY.select(username.label('sort_key'))
+    
+    prefix = request.args.get('q', '').strip()
+    if prefix and prefix.isascii():
+        # A range instead of LIKE so both lower() indexes can be used.
+        prefix = prefix.lower()
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        full_name = func.lower(users.c.full_name)
+        stmt = stmt.where(or_(
+            and_(username >= prefix, username < upper),
+            and_(full_name >= prefix, full_name < upper)
+        ))
+    elif prefix:
+        # SQLite's lower() only folds ASCII, so a Python-lowered bound would
+        # miss names such as 'Élise'; fold both sides in SQL instead.
+        stmt = stmt.where(or_(
+            users.c.username.istartswith(prefix, autoescape=True),
+            users.c.full_name.istartswith(prefix, autoescape=True)
+        ))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            sort_key, user_id = decode_cursor(cursor, str, int)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        stmt = stmt.where(or_(
+            username > sort_key,
+            and_(username == sort_key, users.c.id > user_id)
+        ))
+    
+    rows = fetch(stmt.order_by(username, users.c.id).limit(limit + 1))
+    rows, next_cursor = paginate(rows, limit, key=lambda u: (u.sort_key, u.id))
+    
+    return jsonify({
+        'users': USER_SUMMARY.many(rows),
+        'next_cursor': next_cursor
+    })
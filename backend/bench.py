@@ -0,0 +1,525 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+# Endpoint benchmarks. For every dataset preset the parent process builds
+# (once) a pristine database with datagen.py, copies it, and runs the
+# scenarios below in a child process against the copy through the Flask
+# test client, so each preset gets a fresh interpreter and connection pool.
+#
+# Per scenario it records p50/p95/p99 latency, the most SQL statements any
+# one request issued and the peak Python allocation of a single request.
+# --update-baseline stores the results; later runs exit non-zero when a
+# scenario is slower or allocates more than the baseline plus --margin, or
+# issues more statements than the baseline plus --query-margin. The median
+# cold start of create_app() in a fresh interpreter must also stay within
+# --startup-budget.
+#
+#   python bench.py --presets small medium --update-baseline
+#   python bench.py --presets small medium
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'bench_baseline.json')
+DEFAULT_DATA_DIR = os.path.join(HERE, 'instance', 'bench')
+PASSWORD = 'password'
+
+Scenario = namedtuple('Scenario', 'name run expect prepare')
+SCENARIOS = []
+
+
+def scenario(name, expect=200, prepare=None):
+    def decorator(fn):
+        SCENARIOS.append(Scenario(name, fn, expect, prepare))
+        return fn
+    return decorator
+
+
+# Scenarios receive the bench context and the iteration number; anything a
+# scenario writes is keyed by the iteration so repeated runs never collide.
+@scenario('auth.register', expect=201)
+def _(ctx, i):
+    return ctx.client.post('/api/auth/register', json={
+        'email': f'bench-{ctx.run_id}-{i}@example.com',
+        'username': f'bench-{ctx.run_id}-{i}',
+        'password': PASSWORD,
+        'full_name': 'Bench User',
+    })
+
+@scenario('auth.login')
+def _(ctx, i):
+    return ctx.client.post('/api/auth/login', json={'email': 'user1@example.com', 'password': PASSWORD})
+
+@scenario('auth.refresh')
+def _(ctx, i):
+    return ctx.client.post('/api/auth/refresh', headers=ctx.refresh_headers)
+
+@scenario('auth.me')
+def _(ctx, i):
+    return ctx.client.get('/api/auth/me', headers=ctx.headers)
+
+@scenario('resources.list')
+def _(ctx, i):
+    return ctx.client.get('/api/resources', headers=ctx.headers)
+
+@scenario('resources.list_next_page')
+def _(ctx, i):
+    return ctx.client.get('/api/resources', query_string={'after': ctx.resources_cursor}, headers=ctx.headers)
+
+@scenario('resources.search')
+def _(ctx, i):
+    return ctx.client.get('/api/resources/search', query_string={'q': 'exam notes'}, headers=ctx.headers)
+
+@scenario('resources.upload', expect=201)
+def _(ctx, i):
+    return ctx.upload(f'bench upload {ctx.run_id} {i}')
+
+@scenario('resources.probe')
+def _(ctx, i):
+    return ctx.client.post('/api/resources/probe', query_string={'sha256': ctx.file_hash}, headers=ctx.headers)
+
+@scenario('resources.get')
+def _(ctx, i):
+    return ctx.client.get(f'/api/resources/{ctx.resource_id}', headers=ctx.headers)
+
+@scenario('resources.update')
+def _(ctx, i):
+    return ctx.client.patch(f'/api/resources/{ctx.own_resource_id}', json={'title': f'Bench {i}'}, headers=ctx.headers)
+
+def _prepare_delete(ctx, i):
+    ctx.doomed = ctx.upload(f'bench delete {ctx.run_id} {i}').json['resource']['id']
+
+@scenario('resources.delete', prepare=_prepare_delete)
+def _(ctx, i):
+    return ctx.client.delete(f'/api/resources/{ctx.doomed}', headers=ctx.headers)
+
+@scenario('uploads.download')
+def _(ctx, i):
+    return ctx.client.get(f'/api/uploads/{ctx.resource_id}', headers=ctx.headers)
+
+@scenario('upload_sessions.create', expect=201)
+def _(ctx, i):
+    return ctx.start_session(f'bench session {ctx.run_id} {i}')[0]
+
+def _prepare_chunk(ctx, i):
+    ctx.session_id, ctx.session_content = ctx.start_session(f'bench chunk {ctx.run_id} {i}')[1:]
+
+@scenario('upload_sessions.put_chunk', expect=201, prepare=_prepare_chunk)
+def _(ctx, i):
+    return ctx.put_chunk(ctx.session_id, ctx.session_content)
+
+@scenario('upload_sessions.get')
+def _(ctx, i):
+    return ctx.client.get(f'/api/upload-sessions/{ctx.session_id}', headers=ctx.headers)
+
+def _prepare_complete(ctx, i):
+    ctx.session_id, content = ctx.start_session(f'bench complete {ctx.run_id} {i}')[1:]
+    ctx.put_chunk(ctx.session_id, content)
+
+@scenario('upload_sessions.complete', expect=201, prepare=_prepare_complete)
+def _(ctx, i):
+    return ctx.client.post(f'/api/upload-sessions/{ctx.session_id}/complete', headers=ctx.headers)
+
+@scenario('groups.create', expect=201)
+def _(ctx, i):
+    return ctx.client.post('/api/groups', json={'name': f'Bench {i}', 'category': 'Math'}, headers=ctx.headers)
+
+@scenario('groups.list')
+def _(ctx, i):
+    return ctx.client.get('/api/groups', headers=ctx.headers)
+
+@scenario('groups.list_by_category')
+def _(ctx, i):
+    return ctx.client.get('/api/groups', query_string={'category': 'Math'}, headers=ctx.headers)
+
+@scenario('groups.get')
+def _(ctx, i):
+    return ctx.client.get(f'/api/groups/{ctx.group_id}', headers=ctx.headers)
+
+def _prepare_join(ctx, i):
+    ctx.client.delete(f'/api/groups/{ctx.group_id}/members', headers=ctx.newcomer_headers)
+
+@scenario('groups.join', expect=201, prepare=_prepare_join)
+def _(ctx, i):
+    return ctx.client.post(f'/api/groups/{ctx.group_id}/members', headers=ctx.newcomer_headers)
+
+def _prepare_leave(ctx, i):
+    ctx.client.post(f'/api/groups/{ctx.group_id}/members', headers=ctx.newcomer_headers)
+
+@scenario('groups.leave', prepare=_prepare_leave)
+def _(ctx, i):
+    return ctx.client.delete(f'/api/groups/{ctx.group_id}/members', headers=ctx.newcomer_headers)
+
+@scenario('messages.send', expect=201)
+def _(ctx, i):
+    return ctx.client.post('/api/messages', json={'content': f'Bench {i}', 'group_id': ctx.group_id}, headers=ctx.headers)
+
+@scenario('messages.list')
+def _(ctx, i):
+    return ctx.client.get('/api/messages', query_string={'group_id': ctx.group_id}, headers=ctx.headers)
+
+@scenario('messages.list_earlier')
+def _(ctx, i):
+    return ctx.client.get('/api/messages', query_string={
+        'group_id': ctx.group_id, 'before_id': ctx.before_message_id
+    }, headers=ctx.headers)
+
+@scenario('direct_messages.send', expect=201)
+def _(ctx, i):
+    return ctx.client.post('/api/direct-messages', json={
+        'content': f'Bench {i}', 'receiver_id': ctx.peer_id
+    }, headers=ctx.headers)
+
+@scenario('direct_messages.list')
+def _(ctx, i):
+    return ctx.client.get('/api/direct-messages', query_string={
+        'sender_id': ctx.user_id, 'receiver_id': ctx.peer_id
+    }, headers=ctx.headers)
+
+@scenario('direct_messages.unread')
+def _(ctx, i):
+    return ctx.client.get('/api/direct-messages/unread', headers=ctx.peer_headers)
+
+@scenario('direct_messages.read')
+def _(ctx, i):
+    return ctx.client.post('/api/direct-messages/read', json={'peer_id': ctx.user_id}, headers=ctx.peer_headers)
+
+@scenario('me.groups')
+def _(ctx, i):
+    return ctx.client.get('/api/me/groups', headers=ctx.headers)
+
+def _prepare_read(ctx, i):
+    ctx.client.post('/api/messages', json={'content': f'Bench unread {i}', 'group_id': ctx.group_id},
+                    headers=ctx.newcomer_headers)
+
+@scenario('me.groups_read', prepare=_prepare_read)
+def _(ctx, i):
+    return ctx.client.put(f'/api/me/groups/{ctx.group_id}/read', headers=ctx.headers)
+
+@scenario('stream.open')
+def _(ctx, i):
+    # Time to the first frame; the stream itself never ends.
+    response = ctx.client.get('/api/stream', query_string={'group_id': ctx.group_id},
+                              headers=ctx.headers, buffered=False)
+    next(iter(response.response))
+    response.close()
+    return response
+
+@scenario('users.list')
+def _(ctx, i):
+    return ctx.client.get('/api/users', headers=ctx.headers)
+
+@scenario('users.search')
+def _(ctx, i):
+    return ctx.client.get('/api/users', query_string={'q': 'user1'}, headers=ctx.headers)
+
+@scenario('metrics')
+def _(ctx, i):
+    return ctx.client.get('/api/_metrics', headers=ctx.headers)
+
+
+class BenchContext:
+    def __init__(self, app):
+        from sqlalchemy import func
+        from extensions import db
+        from models import GroupMember, Message, Resource
+
+        self.client = app.test_client()
+        self.run_id = f'{os.getpid()}-{int(time.time())}'
+
+        tokens = self._login('user1@example.com')
+        self.user_id = tokens['user']['id']
+        self.headers = {'Authorization': f"Bearer {tokens['access_token']}"}
+        self.refresh_headers = {'Authorization': f"Bearer {tokens['refresh_token']}"}
+        peer = self._login('user2@example.com')
+        self.peer_id = peer['user']['id']
+        self.peer_headers = {'Authorization': f"Bearer {peer['access_token']}"}
+        newcomer = self.client.post('/api/auth/register', json={
+            'email': f'newcomer-{self.run_id}@example.com',
+            'username': f'newcomer-{self.run_id}',
+            'password': PASSWORD,
+            'full_name': 'Bench Newcomer',
+        }).json
+        self.newcomer_headers = {'Authorization': f"Bearer {newcomer['access_token']}"}
+
+        with app.app_context():
+            # The busiest group and its oldest page boundary.
+            self.group_id = db.session.query(GroupMember.group_id).group_by(
+                GroupMember.group_id
+            ).order_by(func.count().desc()).limit(1).scalar()
+            self.before_message_id = db.session.query(Message.id).filter(
+                Message.group_id == self.group_id
+            ).order_by(Message.id.desc()).offset(200).limit(1).scalar()
+            self.resource_id = db.session.query(func.min(Resource.id)).scalar()
+            self.file_hash = db.session.get(Resource, self.resource_id).file_hash
+
+        # Reading needs a membership; a 409 means user1 already has one.
+        self.client.post(f'/api/groups/{self.group_id}/members', headers=self.headers)
+        self.resources_cursor = self.client.get('/api/resources', headers=self.headers).json['next_cursor']
+        self.own_resource_id = self.upload(f'bench own {self.run_id}').json['resource']['id']
+        self.doomed = None
+        self.session_id = self.start_session(f'bench session {self.run_id}')[1]
+
+    def _login(self, email):
+        response = self.client.post('/api/auth/login', json={'email': email, 'password': PASSWORD})
+        if response.status_code != 200:
+            raise SystemExit(f'Cannot log in as {email}; was the dataset built by datagen.py?')
+        return response.json
+
+    def upload(self, content):
+        return self.client.post('/api/resources', data={
+            'file': (io.BytesIO(content.encode('utf-8')), 'bench.txt'),
+            'title': content,
+            'category': 'Programming',
+        }, headers=self.headers, content_type='multipart/form-data')
+
+
+    def start_session(self, content):
+        content = content.encode('utf-8')
+        response = self.client.post('/api/upload-sessions', json={
+            'file_name': 'bench.txt',
+            'file_size': len(content),
+            'title': 'Bench session',
+            'category': 'Programming',
+        }, headers=self.headers)
+        return response, response.json.get('id'), content
+
+    def put_chunk(self, session_id, content):
+        return self.client.put(f'/api/upload-sessions/{session_id}/chunks/0', data=content, headers=self.headers)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_scenarios(iterations, warmup, only):
+    from sqlalchemy import event
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    ctx = BenchContext(app)
+    results = {}
+    for sc in SCENARIOS:
+        if only and not any(name in sc.name for name in only):
+            continue
+        samples, queries, errors = [], [], 0
+        for i in range(warmup + iterations + 1):
+            if sc.prepare:
+                sc.prepare(ctx, i)
+            measure_memory = i == warmup + iterations
+            if measure_memory:
+                # Last pass only: tracing allocations skews the timings.
+                tracemalloc.start()
+                base = tracemalloc.get_traced_memory()[0]
+            statements[0] = 0
+            started = time.perf_counter()
+            response = sc.run(ctx, i)
+            elapsed = (time.perf_counter() - started) * 1000
+            if measure_memory:
+                peak_kb = (tracemalloc.get_traced_memory()[1] - base) / 1024
+                tracemalloc.stop()
+            if response.status_code != sc.expect:
+                errors += 1
+            if warmup <= i < warmup + iterations:
+                samples.append(elapsed)
+                queries.append(statements[0])
+
+        samples.sort()
+        results[sc.name] = {
+            'p50_ms': round(percentile(samples, 0.50), 3),
+            'p95_ms': round(percentile(samples, 0.95), 3),
+            'p99_ms': round(percentile(samples, 0.99), 3),
+            'queries': max(queries),
+            'peak_kb': round(peak_kb, 1),
+            'errors': errors,
+        }
+    return results
+
+
+def build_dataset(preset, seed, data_dir):
+    # Cached per schema and generator version, so a new table or column
+    # never meets a dataset built before it existed.
+    fingerprint = hashlib.sha256()
+    for name in ('models.py', 'datagen.py'):
+        with open(os.path.join(HERE, name), 'rb') as f:
+            fingerprint.update(f.read())
+    path = os.path.join(data_dir, f'{preset}-{seed}-{fingerprint.hexdigest()[:12]}.db')
+    if not os.path.exists(path):
+        print(f'Generating {preset} dataset (seed {seed})...')
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, 'datagen.py'), '--preset', preset, '--seed', str(seed)],
+            env=child_env(path, data_dir), cwd=data_dir, check=True, stdout=subprocess.DEVNULL
+        )
+    return path
+
+
+def child_env(database, data_dir, cache=False):
+    return {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{database}',
+        # Accounts are generated with this cost; keeping it low stops the
+        # auth scenarios from timing bcrypt alone.
+        'BCRYPT_LOG_ROUNDS': os.environ.get('BCRYPT_LOG_ROUNDS', '4'),
+        'RESPONSE_CACHE': 'memory' if cache else '',
+        'EVENT_BROKER': 'memory',
+        # Extraction jobs would compete with the measured requests.
+        'JOB_WORKERS': '0',
+        'DOWNLOAD_COUNT_LOG_DIR': os.path.join(data_dir, 'counters'),
+    }
+
+
+def run_preset(preset, args):
+    pristine = build_dataset(preset, args.seed, args.data_dir)
+    work = pristine[:-len('.db')] + '.work.db'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    with sqlite3.connect(pristine) as src, sqlite3.connect(work) as dst:
+        src.backup(dst)
+
+    with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+        command = [
+            sys.executable, os.path.abspath(__file__), '--child', '--output', output.name,
+            '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+        ]
+        if args.only:
+            command += ['--only', *args.only]
+        subprocess.run(command, env=child_env(work, args.data_dir, args.cache), cwd=args.data_dir, check=True)
+        return json.load(output)
+
+
+STARTUP_SCRIPT = (
+    'import time; started = time.perf_counter(); '
+    'from app import create_app; create_app(); '
+    'print((time.perf_counter() - started) * 1000)'
+)
+
+
+def measure_startup(args):
+    # Cold start as a respawned worker (or serve.py --no-preload) sees it:
+    # a fresh interpreter importing and building the app.
+    env = {**child_env(os.path.join(args.data_dir, 'startup.db'), args.data_dir), 'PYTHONPATH': HERE}
+    samples = sorted(
+        float(subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=env, cwd=args.data_dir,
+                             check=True, capture_output=True, text=True).stdout)
+        for _ in range(args.startup_runs)
+    )
+    return {'create_app': {
+        'p50_ms': round(percentile(samples, 0.50), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+        'p99_ms': round(percentile(samples, 0.99), 3),
+        'queries': 0,
+        'peak_kb': 0,
+        'errors': 0,
+    }}
+
+
+def compare(results, baseline, args):
+    failures = []
+    for preset, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = baseline.get('results', {}).get(preset, {}).get(name)
+            if current['errors']:
+                failures.append(f"{preset} {name}: {current['errors']} unexpected responses")
+            if previous is None:
+                continue
+            for metric, floor in (('p95_ms', args.latency_floor), ('peak_kb', 0)):
+                # The floor keeps sub-millisecond jitter on fast endpoints from failing the run.
+                limit = max(previous[metric] * (1 + args.margin), previous[metric] + floor)
+                if current[metric] > limit:
+                    failures.append(f'{preset} {name}: {metric} {current[metric]} > {limit:.1f} (baseline {previous[metric]})')
+            if current['queries'] > previous['queries'] + args.query_margin:
+                failures.append(f"{preset} {name}: {current['queries']} queries (baseline {previous['queries']})")
+    return failures
+
+
+def report(results):
+    print(f"{'scenario':<30}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}")
+    for preset, scenarios in results.items():
+        print(f'-- {preset}')
+        for name, r in scenarios.items():
+            print(f"{name:<30}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['queries']:>9}{r['peak_kb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API endpoints against generated datasets.')
+    parser.add_argument('--presets', nargs='+', default=['small'])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='+', help='run scenarios whose name contains any of these')
+    parser.add_argument('--cache', action='store_true', help='leave the response cache enabled')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--margin', type=float, default=0.25, help='allowed relative growth of p95 latency and peak memory')
+    parser.add_argument('--latency-floor', type=float, default=2.0, help='p95 growth in ms that is never a regression')
+    parser.add_argument('--query-margin', type=int, default=0, help='allowed extra SQL statements per request')
+    parser.add_argument('--startup-budget', type=float, default=1000, help='maximum median create_app() cold start in ms')
+    parser.add_argument('--startup-runs', type=int, default=5)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, HERE)
+        with open(args.output, 'w') as f:
+            json.dump(run_scenarios(args.iterations, args.warmup, args.only), f)
+        return
+
+    args.data_dir = os.path.abspath(args.data_dir)
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {preset: run_preset(preset, args) for preset in args.presets}
+    results['startup'] = measure_startup(args)
+    report(results)
+
+    startup_ms = results['startup']['create_app']['p50_ms']
+    if startup_ms > args.startup_budget:
+        print(f'\ncreate_app() cold start of {startup_ms} ms is over the {args.startup_budget:g} ms budget.')
+        sys.exit(1)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.setdefault('results', {}).update(results)
+        baseline['iterations'] = args.iterations
+        baseline['seed'] = args.seed
+        baseline['python'] = sys.version.split()[0]
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print('No baseline to compare against; run with --update-baseline first.')
+        return
+    with open(args.baseline) as f:
+        failures = compare(results, json.load(f), args)
+    if failures:
+        print('\nRegressions:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\nNo regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import functools
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+
+
+# Entries are keyed by endpoint, query string and the current version of
+# every table the endpoint reads. Write paths bump the version of the tables
+# they touch, which makes every dependent entry unreachable at once; the
+# orphans age out through normal LRU eviction. Versions only ever move in
+# this process, so entries also expire after `ttl` seconds as a backstop
+# against writes made elsewhere (another process, a CLI command).
+class MemoryBackend:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._size -= len(value)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._size += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def versions(self, tables):
+        with self._lock:
+            return [self._versions.get(t, 0) for t in tables]
+
+    def bump(self, tables):
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'evictions': self.evictions}
+
+
+# Shared by every worker on the host through one SQLite file, so a write
+# handled by one worker invalidates what the others serve. Eviction order
+# only needs to be approximate, so a hit refreshes `accessed_at` at most
+# once every `touch_interval` seconds instead of writing on every read.
+class SQLiteBackend:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, touch_interval=60):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.evictions = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT value, accessed_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.touch_interval:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (key, value, size, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, value, len(value), time.time())
+        )
+        total = conn.execute('SELECT coalesce(sum(size), 0) FROM entries').fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute('SELECT key, size FROM entries ORDER BY accessed_at LIMIT 1').fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM entries WHERE key = ?', (row[0],))
+            total -= row[1]
+            self.evictions += 1
+
+    def versions(self, tables):
+        rows = dict(self._connect().execute(
+            f"SELECT name, version FROM versions WHERE name IN ({','.join('?' * len(tables))})",
+            tables
+        ).fetchall())
+        return [rows.get(t, 0) for t in tables]
+
+    def bump(self, tables):
+        conn = self._connect()
+        for t in tables:
+            conn.execute(
+                'INSERT INTO versions (name, version) VALUES (?, 1) '
+                'ON CONFLICT(name) DO UPDATE SET version = version + 1',
+                (t,)
+            )
+
+    def stats(self):
+        entries, size = self._connect().execute(
+            'SELECT count(*), coalesce(sum(size), 0) FROM entries'
+        ).fetchone()
+        return {'entries': entries, 'bytes': size, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RESPONSE_CACHE', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryBackend(
+                max_entries=app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024),
+                max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                ttl=app.config.get('RESPONSE_CACHE_TTL', 300)
+            )
+        elif backend == 'sqlite':
+            path = app.config.get('RESPONSE_CACHE_PATH') or os.path.join(app.instance_path, 'response_cache.db')
+            self.backend = SQLiteBackend(path, max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        elif backend:
+            raise ValueError(f'Unknown RESPONSE_CACHE {backend!r}')
+        app.extensions['response_cache'] = self
+
+    def cached(self, *tables):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                versions = self.backend.versions(tables)
+                query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+                key = f"{request.endpoint}:{kwargs}?{query}|{','.join(map(str, versions))}"
+
+                body = self.backend.get(key)
+                if body is not None:
+                    with self._lock:
+                        self.hits += 1
+                    return self._response(body)
+
+                with self._lock:
+                    self.misses += 1
+                response = view(*args, **kwargs)
+                if getattr(response, 'status_code', None) == 200 and response.is_json:
+                    self.backend.set(key, response.get_data())
+                return response
+            return wrapper
+        return decorator
+
+    def bump(self, *tables):
+        if self.backend is not None:
+            self.backend.bump(tables)
+
+    def stats(self):
+        if self.backend is None:
+            return {'enabled': False}
+        return {'enabled': True, 'hits': self.hits, 'misses': self.misses, **self.backend.stats()}
+
+    @staticmethod
+    def _response(body):
+        return current_app.response_class(body, mimetype='application/json')
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,53 @@
+import random
+
+READ_SIZE = 1024 * 1024
+
+# Gear table for the rolling hash. Chunk boundaries, and with them every
+# stored manifest, depend on it, so it must never change.
+_seeded = random.Random(0x5eedc0de)
+GEAR = tuple(_seeded.getrandbits(64) for _ in range(256))
+MASK64 = (1 << 64) - 1
+# Each step shifts the hash left by one, so after 64 bytes nothing older is
+# left in it: boundaries depend only on the last WINDOW bytes.
+WINDOW = 64
+
+
+# Content-defined chunking with a gear rolling hash (as in FastCDC). A chunk
+# ends where the top bits of the hash over the preceding 64 bytes are all
+# zero, which happens every `avg_size` bytes on average. Because the cut
+# points follow the content rather than fixed offsets, inserting or removing
+# a page only changes the chunks around the edit; everything after it
+# re-synchronizes and deduplicates against the earlier version.
+def split(stream, min_size, avg_size, max_size):
+    bits = avg_size.bit_length() - 1
+    mask = ((1 << bits) - 1) << (64 - bits)
+    buffer = b''
+    eof = False
+    while True:
+        while not eof and len(buffer) < max_size:
+            data = stream.read(READ_SIZE)
+            if not data:
+                eof = True
+            buffer += data
+        if not buffer:
+            return
+        cut = cut_point(buffer, min_size, max_size, mask)
+        yield buffer[:cut]
+        buffer = buffer[cut:]
+
+
+def cut_point(data, min_size, max_size, mask):
+    end = min(len(data), max_size)
+    if end <= min_size:
+        return end
+    # Bytes before the window ending at min_size cannot affect any boundary
+    # we are allowed to cut at, so they are not hashed at all.
+    gear = GEAR
+    h = 0
+    for i in range(min_size - WINDOW, min_size):
+        h = ((h << 1) + gear[data[i]]) & MASK64
+    for i in range(min_size, end):
+        h = ((h << 1) + gear[data[i]]) & MASK64
+        if not h & mask:
+            return i + 1
+    return end
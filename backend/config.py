@@ -0,0 +1,58 @@
+import os
+
+
+def _flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def from_env():
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'sqlite:///campus_connect.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'DB_POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'DB_MAX_OVERFLOW': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'DB_POOL_RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'SQLITE_BUSY_TIMEOUT': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'SQLITE_MMAP_SIZE': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'JWT_SECRET_KEY': os.environ.get('JWT_SECRET', 'super-secret-key'),
+        'JWT_TOKEN_LOCATION': ['headers'],
+        'UPLOAD_FOLDER': 'uploads',
+        'ALLOWED_EXTENSIONS': {'pdf', 'docx', 'pptx', 'txt', 'jpg', 'png'},
+        'UPLOAD_CHUNK_SIZE': int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)),
+        'UPLOAD_SESSION_TTL': int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600)),
+        'MAX_UPLOAD_SIZE': int(os.environ.get('MAX_UPLOAD_SIZE', 2 * 1024 ** 3)),
+        'UPLOAD_SESSIONS_PER_USER': int(os.environ.get('UPLOAD_SESSIONS_PER_USER', 8)),
+        'STORAGE_MODE': os.environ.get('STORAGE_MODE', 'whole'),
+        'CHUNK_MIN_SIZE': int(os.environ.get('CHUNK_MIN_SIZE', 16 * 1024)),
+        'CHUNK_AVG_SIZE': int(os.environ.get('CHUNK_AVG_SIZE', 64 * 1024)),
+        'CHUNK_MAX_SIZE': int(os.environ.get('CHUNK_MAX_SIZE', 256 * 1024)),
+        'CHUNK_JOB_TIMEOUT': float(os.environ.get('CHUNK_JOB_TIMEOUT', 300)),
+        'CHUNK_SWEEP_DELAY': int(os.environ.get('CHUNK_SWEEP_DELAY', 600)),
+        'SENDFILE_MODE': os.environ.get('SENDFILE_MODE'),
+        'SENDFILE_PREFIX': os.environ.get('SENDFILE_PREFIX', '/protected-uploads/'),
+        'DOWNLOAD_COUNT_FLUSH_INTERVAL': float(os.environ.get('DOWNLOAD_COUNT_FLUSH_INTERVAL', 5)),
+        'DOWNLOAD_COUNT_FSYNC': _flag('DOWNLOAD_COUNT_FSYNC'),
+        'DOWNLOAD_COUNT_LOG_DIR': os.environ.get('DOWNLOAD_COUNT_LOG_DIR'),
+        'BCRYPT_LOG_ROUNDS': int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)),
+        'PASSWORD_HASH_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None,
+        'PASSWORD_HASH_MAX_QUEUE': int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 16)),
+        'JWT_PROFILE_CLAIMS': _flag('JWT_PROFILE_CLAIMS'),
+        'IDENTITY_CACHE_TTL': int(os.environ.get('IDENTITY_CACHE_TTL', 300)),
+        'RESPONSE_CACHE': os.environ.get('RESPONSE_CACHE', 'memory'),
+        'RESPONSE_CACHE_PATH': os.environ.get('RESPONSE_CACHE_PATH'),
+        'RESPONSE_CACHE_TTL': float(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+        'EVENT_BROKER': os.environ.get('EVENT_BROKER', 'memory'),
+        'EVENT_BROKER_PATH': os.environ.get('EVENT_BROKER_PATH'),
+        'JOB_WORKERS': int(os.environ.get('JOB_WORKERS', 2)),
+        'JOB_POLL_INTERVAL': float(os.environ.get('JOB_POLL_INTERVAL', 1)),
+        'JOB_LEASE': int(os.environ.get('JOB_LEASE', 120)),
+        'JOB_RETRY_DELAY': float(os.environ.get('JOB_RETRY_DELAY', 5)),
+        'TEXT_EXTRACT_TIMEOUT': float(os.environ.get('TEXT_EXTRACT_TIMEOUT', 30)),
+        'TEXT_EXTRACT_MAX_CHARS': int(os.environ.get('TEXT_EXTRACT_MAX_CHARS', 200000)),
+        'MESSAGE_BATCHING': _flag('MESSAGE_BATCHING'),
+        'MESSAGE_BATCH_WINDOW_MS': float(os.environ.get('MESSAGE_BATCH_WINDOW_MS', 5)),
+        'MESSAGE_BATCH_SIZE': int(os.environ.get('MESSAGE_BATCH_SIZE', 64)),
+        'INSTRUMENTATION': _flag('INSTRUMENTATION'),
+        'SLOW_REQUEST_MS': float(os.environ.get('SLOW_REQUEST_MS', 500)),
+        'N_PLUS_ONE_THRESHOLD': int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5)),
+    }
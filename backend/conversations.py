@@ -0,0 +1,49 @@
+from sqlalchemy import update
+
+from extensions import db
+from models import DirectMessage, UnreadCount, User
+
+
+def conversation_key(user_id, peer_id):
+    low, high = sorted((int(user_id), int(peer_id)))
+    return f'{low}:{high}'
+
+
+def increment_unread(user_id, peer_id, amount=1):
+    updated = db.session.execute(
+        update(UnreadCount)
+        .where(UnreadCount.user_id == user_id, UnreadCount.peer_id == peer_id)
+        .values(count=UnreadCount.count + amount)
+    ).rowcount
+    if not updated:
+        db.session.add(UnreadCount(user_id=user_id, peer_id=peer_id, count=amount))
+
+
+def mark_read(user_id, peer_id):
+    marked = db.session.execute(
+        update(DirectMessage)
+        .where(
+            DirectMessage.conversation_key == conversation_key(user_id, peer_id),
+            DirectMessage.receiver_id == user_id,
+            DirectMessage.read.is_(False)
+        )
+        .values(read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.execute(
+        update(UnreadCount)
+        .where(UnreadCount.user_id == user_id, UnreadCount.peer_id == peer_id)
+        .values(count=0)
+    )
+    return marked
+
+
+def unread_counts(user_id):
+    return db.session.query(
+        UnreadCount.peer_id,
+        User.username,
+        UnreadCount.count
+    ).join(User, UnreadCount.peer_id == User.id).filter(
+        UnreadCount.user_id == user_id,
+        UnreadCount.count > 0
+    ).order_by(UnreadCount.peer_id).all()
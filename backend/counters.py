@@ -0,0 +1,198 @@
+import atexit
+import glob
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from cache import response_cache
+from extensions import db
+from models import CounterSegment, Resource
+
+# Applied segment names are remembered long enough for any worker that had
+# already opened the same file to see the conflict.
+SEGMENT_RETENTION = timedelta(days=1)
+
+# Write-behind download counter. A GET only appends the resource id to a
+# per-process log segment and bumps an in-memory tally; a background thread
+# periodically seals the segment and applies it as one batched
+# `download_count = download_count + :n` per resource.
+#
+# Each sealed segment is applied in the same transaction that records its
+# name in `counter_segments`, so a segment replayed after a crash is never
+# counted twice. Each process applies only its own segments; ones left behind
+# by a dead process (sealed or still in `.log` state) are picked up by the
+# next flush of any worker.
+class DownloadCounter:
+    def __init__(self, app=None):
+        self.app = None
+        self.log_dir = None
+        self.interval = None
+        self.fsync = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        # Sealed segment path -> its counts, until the segment is applied.
+        self._in_flight = {}
+        self._segment = None
+        self._segment_path = None
+        self._seq = 0
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.log_dir = app.config.get('DOWNLOAD_COUNT_LOG_DIR') or os.path.join(app.instance_path, 'counters')
+        self.interval = app.config.get('DOWNLOAD_COUNT_FLUSH_INTERVAL', 5.0)
+        self.fsync = app.config.get('DOWNLOAD_COUNT_FSYNC', False)
+        app.extensions['download_counter'] = self
+
+    def increment(self, resource_id):
+        with self._lock:
+            self._ensure_started()
+            self._segment.write(f'{resource_id}\n')
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            self._pending[resource_id] += 1
+
+    def pending(self, resource_id):
+        with self._lock:
+            return self._pending.get(resource_id, 0) + sum(
+                counts.get(resource_id, 0) for counts in self._in_flight.values()
+            )
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._segment is not None and self._pending:
+                    sealed = self._seal_current()
+                    self._open_segment()
+                    self._in_flight[sealed] = self._pending
+                    self._pending = Counter()
+            if self.log_dir is None or not os.path.isdir(self.log_dir):
+                return
+            self._recover_orphans()
+            with self.app.app_context():
+                segments = [
+                    path for path in sorted(glob.glob(os.path.join(self.log_dir, '*.sealed')))
+                    if self._owned(path)
+                ]
+                applied = False
+                for path in segments:
+                    try:
+                        self._apply_segment(path)
+                    except Exception:
+                        # Left sealed on disk (and counted as pending) for
+                        # the next flush; the other segments still go.
+                        db.session.rollback()
+                        self.app.logger.exception('Failed to apply counter segment %s', path)
+                        continue
+                    applied = True
+                    with self._lock:
+                        self._in_flight.pop(path, None)
+                if applied:
+                    response_cache.bump('resources')
+                db.session.execute(
+                    delete(CounterSegment)
+                    .where(CounterSegment.applied_at < datetime.utcnow() - SEGMENT_RETENTION)
+                )
+                db.session.commit()
+
+    def _ensure_started(self):
+        # Started lazily so that a pre-forked worker gets its own segment
+        # and flusher thread rather than inheriting the parent's.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._epoch = int(time.time() * 1000)
+        self._seq = 0
+        self._pending.clear()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name='download-counter', daemon=True)
+        self._thread.start()
+        atexit.register(self._shutdown)
+
+    def _open_segment(self):
+        self._seq += 1
+        name = f'downloads-{self._pid}-{self._epoch}-{self._seq:06d}'
+        self._segment_path = os.path.join(self.log_dir, f'{name}.log')
+        self._segment = open(self._segment_path, 'a', encoding='ascii')
+
+    def _seal_current(self):
+        self._segment.close()
+        sealed = self._segment_path[:-len('.log')] + '.sealed'
+        os.replace(self._segment_path, sealed)
+        return sealed
+
+    @staticmethod
+    def _owned(path):
+        pid = int(os.path.basename(path).split('-')[1])
+        return pid == os.getpid() or not _process_alive(pid)
+
+    def _recover_orphans(self):
+        for path in glob.glob(os.path.join(self.log_dir, 'downloads-*.log')):
+            pid = int(os.path.basename(path).split('-')[1])
+            if pid != os.getpid() and not _process_alive(pid):
+                os.replace(path, path[:-len('.log')] + '.sealed')
+
+    def _apply_segment(self, path):
+        name = os.path.basename(path)[:-len('.sealed')]
+        try:
+            with open(path, encoding='ascii') as f:
+                counts = Counter(int(line) for line in f if line.strip())
+        except FileNotFoundError:
+            # Recovered from a dead process and applied by another worker.
+            return
+
+        try:
+            db.session.execute(insert(CounterSegment).values(name=name))
+            if counts:
+                resources = Resource.__table__
+                db.session.execute(
+                    update(resources)
+                    .where(resources.c.id == bindparam('rid'))
+                    .values(download_count=func.coalesce(resources.c.download_count, 0) + bindparam('n')),
+                    [{'rid': rid, 'n': n} for rid, n in counts.items()]
+                )
+            db.session.commit()
+        except IntegrityError:
+            # Already applied by an earlier flush or another worker.
+            db.session.rollback()
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('Failed to flush download counters')
+
+    def _shutdown(self):
+        if self._pid == os.getpid():
+            self.flush()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+download_counter = DownloadCounter()
@@ -0,0 +1,336 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from flask_migrate import Migrate, stamp
+from sqlalchemy import bindparam, func, insert, inspect, select, update
+
+from app import create_app
+from cache import response_cache
+from extensions import db
+from models import User, Resource, Blob, Group, GroupMember, Message, DirectMessage, UnreadCount
+from passwords import hasher
+from storage import storage
+from conversations import conversation_key
+
+# Synthetic datasets for load testing. Rows go in through Core executemany
+# batches (no ORM objects, no per-user bcrypt), so the denormalized columns
+# the mapper hooks would normally maintain -- groups.member_count,
+# blobs.ref_count, dm_unread_counts -- are computed here instead.
+#
+# Output is a function of the seed and of what is already in the database,
+# so the same command against the same starting point gives the same rows.
+#
+# A fresh dataset is built with create_all and stamped at the migration head,
+# so `flask db upgrade` keeps working on it. Tables that already exist are
+# only dropped with --reset.
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+PRESETS = {
+    'small': dict(users=200, groups=20, resources=100, messages=2000, direct_messages=1000),
+    'medium': dict(users=5000, groups=200, resources=2000, messages=50000, direct_messages=25000),
+    'large': dict(users=100000, groups=2000, resources=20000, messages=1000000, direct_messages=500000),
+}
+
+FIRST_NAMES = ['Amina', 'Brian', 'Chloe', 'David', 'Esther', 'Faith', 'George', 'Hannah', 'Ian', 'Joy',
+               'Kevin', 'Linda', 'Mark', 'Naomi', 'Oscar', 'Purity', 'Quinn', 'Ruth', 'Samuel', 'Tracy']
+LAST_NAMES = ['Achieng', 'Baraka', 'Cheruiyot', 'Doe', 'Emuria', 'Gitau', 'Kamau', 'Kiprop', 'Mwangi',
+              'Njeri', 'Odhiambo', 'Otieno', 'Smith', 'Wanjiru', 'Wekesa']
+FIELDS = ['Computer Science', 'Mathematics', 'Physics', 'Medicine', 'Law', 'Economics', 'History',
+          'Architecture', 'Education', 'Engineering']
+CATEGORIES = ['Math', 'Science', 'History', 'Art', 'Programming']
+WORDS = ['assignment', 'exam', 'notes', 'lecture', 'project', 'deadline', 'tutorial', 'lab', 'revision',
+         'question', 'slides', 'chapter', 'group', 'library', 'schedule', 'quiz', 'summary', 'thesis']
+
+
+def skewed(rng, n, power):
+    # Index in [0, n) biased towards 0; power 1 is uniform, higher is hotter.
+    return int(n * rng.random() ** power)
+
+
+def sentence(rng, low=4, high=14):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def timestamps(rng, start, count, end=None):
+    # Increasing timestamps spread over [start, end], so ids and created_at
+    # agree the way they do for rows written by the app.
+    end = end or datetime.utcnow()
+    step = (end - start) / max(count, 1)
+    for i in range(count):
+        yield start + step * (i + rng.random())
+
+
+def insert_batches(table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(table), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+        db.session.commit()
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def start_time(model, days):
+    latest = db.session.query(func.max(model.created_at)).scalar()
+    return latest or datetime.utcnow() - timedelta(days=days)
+
+
+def generate(users=1000, groups=50, resources=500, messages=10000, direct_messages=5000,
+             files=None, seed=42, append=False, reset=False, batch_size=5000, password='password', days=180):
+    if not append:
+        if not reset and inspect(db.engine).get_table_names():
+            raise SystemExit(f'{db.engine.url} already has tables; pass --reset to drop them or --append to add to them')
+        db.drop_all()
+        db.create_all()
+        stamp(directory=MIGRATIONS)
+
+    first_user = next_id(User)
+    rng = random.Random(f'{seed}:{first_user}')
+    started = time.perf_counter()
+
+    # Users. One bcrypt hash shared by every generated account.
+    password_hash = hasher.hash(password)
+    user_times = timestamps(rng, start_time(User, days), users)
+    insert_batches(User.__table__, ({
+        'id': uid,
+        'email': f'user{uid}@example.com',
+        'username': f'user{uid}',
+        'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'field_of_study': rng.choice(FIELDS),
+        'password_hash': password_hash,
+        'created_at': next(user_times),
+    } for uid in range(first_user, first_user + users)), batch_size)
+    user_count = first_user + users - 1
+    print(f'users: {users} (total {user_count})')
+
+    # Groups. Low ids are the hot groups; membership falls off with rank.
+    first_group = next_id(Group)
+    group_rows = []
+    member_rows = []
+    group_times = timestamps(rng, start_time(Group, days), groups)
+    for gid in range(first_group, first_group + groups):
+        rank = gid - first_group + 1
+        creator = 1 + skewed(rng, user_count, 3)
+        size = min(user_count, max(3, int(user_count * 0.2 / rank ** 0.8)))
+        member_ids = set(rng.sample(range(1, user_count + 1), size))
+        member_ids.add(creator)
+        created_at = next(group_times)
+        group_rows.append({
+            'id': gid,
+            'name': f'{rng.choice(CATEGORIES)} {rng.choice(WORDS)} group {gid}',
+            'description': sentence(rng),
+            'category': rng.choice(CATEGORIES),
+            'created_by': creator,
+            'created_at': created_at,
+            'member_count': len(member_ids),
+        })
+        member_rows.extend({
+            'user_id': uid,
+            'group_id': gid,
+            'role': 'owner' if uid == creator else 'member',
+            'joined_at': created_at,
+        } for uid in sorted(member_ids))
+    insert_batches(Group.__table__, group_rows, batch_size)
+    insert_batches(GroupMember.__table__, member_rows, batch_size)
+    print(f'groups: {groups}, memberships: {len(member_rows)}')
+
+    # Resources. `files` distinct contents shared across rows, so the blob
+    # store sees realistic dedupe; ref_count is added onto existing blobs.
+    files = files or max(1, resources // 2)
+    contents = {}
+    for k in range(files if resources else 0):
+        data = f'CampusConnect synthetic file {seed}-{k}\n'.encode('utf-8') * rng.randint(1, 512)
+        file_hash, path = storage.put_bytes(data)
+        contents[k] = (file_hash, path, len(data))
+
+    first_resource = next_id(Resource)
+    refs = Counter()
+    resource_rows = []
+    resource_times = timestamps(rng, start_time(Resource, days), resources)
+    for rid in range(first_resource, first_resource + resources):
+        file_hash, path, size = contents[skewed(rng, files, 2)]
+        refs[file_hash] += 1
+        resource_rows.append({
+            'id': rid,
+            'title': f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rid}',
+            'description': sentence(rng),
+            'category': rng.choice(CATEGORIES),
+            'file_path': path,
+            'file_name': f'resource_{rid}.txt',
+            'file_size': size,
+            'file_hash': file_hash,
+            'download_count': skewed(rng, 1000, 6),
+            'user_id': 1 + skewed(rng, user_count, 3),
+            'created_at': next(resource_times),
+        })
+    insert_batches(Resource.__table__, resource_rows, batch_size)
+
+    existing = set(db.session.scalars(select(Blob.file_hash).where(Blob.file_hash.in_(list(refs)))))
+    blobs = Blob.__table__
+    if existing:
+        db.session.execute(
+            update(blobs)
+            .where(blobs.c.file_hash == bindparam('h'))
+            .values(ref_count=blobs.c.ref_count + bindparam('n')),
+            [{'h': h, 'n': refs[h]} for h in existing]
+        )
+    sizes = {h: size for h, _, size in contents.values()}
+    insert_batches(blobs, ({
+        'file_hash': h, 'file_size': sizes[h], 'ref_count': n, 'created_at': datetime.utcnow()
+    } for h, n in refs.items() if h not in existing), batch_size)
+    resource_count = first_resource + resources - 1
+    print(f'resources: {resources}, blobs: {len(refs)}')
+
+    # Group messages. Hot groups get most of the traffic and a few heavy
+    # posters in each group write most of it.
+    members = defaultdict(list)
+    for uid, gid in db.session.execute(select(GroupMember.user_id, GroupMember.group_id).order_by(GroupMember.id)):
+        members[gid].append(uid)
+    group_ids = sorted(members)
+    message_times = timestamps(rng, start_time(Message, days), messages)
+    # Core inserts skip the Message hooks, so seq and the group counters are
+    # kept here.
+    seqs = dict(db.session.execute(select(Group.id, Group.message_count)).all())
+
+    def message_rows():
+        for _ in range(messages):
+            gid = group_ids[skewed(rng, len(group_ids), 2)]
+            posters = members[gid]
+            seqs[gid] += 1
+            yield {
+                'content': sentence(rng),
+                'user_id': posters[skewed(rng, len(posters), 4)],
+                'group_id': gid,
+                'seq': seqs[gid],
+                'resource_id': 1 + skewed(rng, resource_count, 2) if resource_count and rng.random() < 0.05 else None,
+                'created_at': next(message_times),
+            }
+    if group_ids:
+        insert_batches(Message.__table__, message_rows(), batch_size)
+        groups_table, messages_table, members_table = Group.__table__, Message.__table__, GroupMember.__table__
+        db.session.execute(
+            update(groups_table)
+            .where(groups_table.c.id == bindparam('gid'))
+            .values(
+                message_count=bindparam('n'),
+                last_message_id=select(messages_table.c.id).where(
+                    messages_table.c.group_id == groups_table.c.id,
+                    messages_table.c.seq == bindparam('n')
+                ).scalar_subquery()
+            ),
+            [{'gid': gid, 'n': seqs[gid]} for gid in group_ids]
+        )
+        # Most members are nearly caught up; a few are far behind. A separate
+        # generator keeps the rows generated after this unchanged.
+        marks = random.Random(f'{seed}:{first_user}:watermarks')
+        watermarks = [
+            {'uid': uid, 'gid': gid, 'seq': max(0, seqs[gid] - skewed(marks, 200, 4))}
+            for gid in group_ids for uid in members[gid]
+        ]
+        db.session.execute(
+            update(members_table)
+            .where(members_table.c.user_id == bindparam('uid'), members_table.c.group_id == bindparam('gid'))
+            .values(
+                last_read_seq=bindparam('seq'),
+                last_read_message_id=select(messages_table.c.id).where(
+                    messages_table.c.group_id == bindparam('gid'),
+                    messages_table.c.seq == bindparam('seq')
+                ).scalar_subquery()
+            ),
+            watermarks
+        )
+        db.session.commit()
+    print(f'group messages: {messages if group_ids else 0}')
+
+    # Direct messages. Both ends are skewed towards the same active users,
+    # and only recent messages are left unread.
+    unread = Counter()
+    dm_times = timestamps(rng, start_time(DirectMessage, days), direct_messages)
+
+    def direct_message_rows():
+        for i in range(direct_messages):
+            sender = 1 + skewed(rng, user_count, 3)
+            receiver = 1 + skewed(rng, user_count, 2)
+            if receiver == sender:
+                receiver = receiver % user_count + 1
+            read = i < direct_messages * 0.9 or rng.random() < 0.5
+            if not read:
+                unread[(receiver, sender)] += 1
+            yield {
+                'content': sentence(rng),
+                'sender_id': sender,
+                'receiver_id': receiver,
+                'conversation_key': conversation_key(sender, receiver),
+                'resource_id': None,
+                'created_at': next(dm_times),
+                'read': read,
+            }
+    if user_count > 1:
+        insert_batches(DirectMessage.__table__, direct_message_rows(), batch_size)
+
+    counts = UnreadCount.__table__
+    existing = set(map(tuple, db.session.execute(select(UnreadCount.user_id, UnreadCount.peer_id))))
+    if existing & unread.keys():
+        db.session.execute(
+            update(counts)
+            .where(counts.c.user_id == bindparam('u'), counts.c.peer_id == bindparam('p'))
+            .values(count=counts.c.count + bindparam('n')),
+            [{'u': u, 'p': p, 'n': unread[(u, p)]} for u, p in existing & unread.keys()]
+        )
+    insert_batches(counts, ({
+        'user_id': u, 'peer_id': p, 'count': n
+    } for (u, p), n in unread.items() if (u, p) not in existing), batch_size)
+    db.session.commit()
+    print(f'direct messages: {direct_messages if user_count > 1 else 0}, unread conversations: {len(unread)}')
+
+    response_cache.bump('users', 'resources', 'groups')
+    print(f'Generated in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic CampusConnect dataset.')
+    parser.add_argument('--preset', choices=sorted(PRESETS))
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--groups', type=int)
+    parser.add_argument('--resources', type=int)
+    parser.add_argument('--messages', type=int)
+    parser.add_argument('--direct-messages', type=int)
+    parser.add_argument('--files', type=int, help='distinct file contents shared by the resources')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--append', action='store_true', help='add to the existing data instead of recreating it')
+    parser.add_argument('--reset', action='store_true', help='drop and recreate the tables of an existing database')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--password', default='password', help='password of every generated account')
+    args = parser.parse_args()
+
+    # Appending without a preset adds only what was asked for.
+    if args.preset:
+        options = dict(PRESETS[args.preset])
+    elif args.append:
+        options = dict(users=0, groups=0, resources=0, messages=0, direct_messages=0)
+    else:
+        options = {}
+    for name in ('users', 'groups', 'resources', 'messages', 'direct_messages', 'files'):
+        if getattr(args, name) is not None:
+            options[name] = getattr(args, name)
+
+    app = create_app()
+    Migrate(app, db)
+    with app.app_context():
+        generate(seed=args.seed, append=args.append, reset=args.reset, batch_size=args.batch_size,
+                 password=args.password, **options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+
+# Engine settings picked from the database URL. SQLite gets per-connection
+# pragmas: WAL lets readers proceed while a writer commits, NORMAL sync is
+# durable across application crashes in WAL mode, and the busy timeout makes
+# concurrent writers wait for the lock instead of failing immediately.
+# Server databases get an explicitly sized pool whose connections are
+# recycled before the server or a proxy drops them.
+#
+# Must be initialised before `db.init_app`, which creates the engine.
+class EngineProfile:
+    def __init__(self, app=None):
+        self.pragmas = {}
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+
+        if url.get_backend_name() == 'sqlite':
+            self.pragmas = {
+                'journal_mode': app.config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+                'synchronous': app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                'busy_timeout': app.config.get('SQLITE_BUSY_TIMEOUT', 5000),
+                'mmap_size': app.config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+            }
+            if not self._listening:
+                event.listen(Engine, 'connect', self._on_connect)
+                self._listening = True
+        else:
+            options.setdefault('pool_size', app.config.get('DB_POOL_SIZE', 10))
+            options.setdefault('max_overflow', app.config.get('DB_MAX_OVERFLOW', 20))
+            options.setdefault('pool_recycle', app.config.get('DB_POOL_RECYCLE', 1800))
+            options.setdefault('pool_timeout', app.config.get('DB_POOL_TIMEOUT', 30))
+            options.setdefault('pool_pre_ping', True)
+
+        app.extensions['engine_profile'] = self
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+engine_profile = EngineProfile()
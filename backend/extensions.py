@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from flask_jwt_extended import JWTManager
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
\ No newline at end of file
+bcrypt = Bcrypt()
+jwt = JWTManager()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import re
+import time
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+from cache import response_cache
+from extensions import db
+from jobs import JobError, JobTimeout, jobs
+from models import Blob, BlobText, Resource
+from search import index_body
+from storage import storage
+
+EXTRACTABLE = {'txt', 'docx', 'pptx'}
+
+WORD = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DRAWING = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+SLIDE = re.compile(r'ppt/slides/slide(\d+)\.xml')
+
+# Check the deadline every this many parsed XML elements.
+DEADLINE_STRIDE = 2000
+
+
+# Text extraction for search, run as an `extract_text` job after upload.
+# Office files are zip archives of XML parts; the text runs (w:t in Word,
+# a:t in PowerPoint) are streamed out of them with iterparse, one paragraph
+# per line, stopping at TEXT_EXTRACT_MAX_CHARS. Parts larger than
+# TEXT_EXTRACT_MAX_PART_SIZE uncompressed are refused rather than inflated.
+#
+# Text is stored per blob, so content uploaded again (by anyone) is neither
+# extracted nor stored twice.
+class TextExtractor:
+    def __init__(self, app=None):
+        self.max_chars = None
+        self.max_part_size = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_chars = app.config.get('TEXT_EXTRACT_MAX_CHARS', 200000)
+        self.max_part_size = app.config.get('TEXT_EXTRACT_MAX_PART_SIZE', 64 * 1024 * 1024)
+        jobs.register(
+            'extract_text', self.run,
+            timeout=app.config.get('TEXT_EXTRACT_TIMEOUT', 30),
+            max_attempts=3
+        )
+        app.cli.add_command(extract_text_command)
+        app.extensions['text_extractor'] = self
+
+    def enqueue(self, file_hash, file_name):
+        # In the caller's transaction; returns whether a job was added.
+        kind = file_name.rsplit('.', 1)[-1].lower()
+        if kind not in EXTRACTABLE or db.session.get(BlobText, file_hash) is not None:
+            return False
+        jobs.enqueue('extract_text', {'file_hash': file_hash, 'kind': kind})
+        return True
+
+    def run(self, payload, deadline):
+        file_hash = payload['file_hash']
+        if db.session.get(BlobText, file_hash) is not None:
+            return
+        resource = Resource.query.filter_by(file_hash=file_hash).first()
+        if resource is None:
+            # Deleted before its turn came.
+            return
+
+        with storage.open(resource) as f:
+            text = self.extract(f, payload['kind'], deadline)
+        if db.session.get(Blob, file_hash) is None:
+            return
+        db.session.add(BlobText(file_hash=file_hash, content=text, extracted_at=datetime.utcnow()))
+        index_body(file_hash, text)
+        db.session.commit()
+        response_cache.bump('resources')
+
+    def extract(self, f, kind, deadline):
+        # `f` is a binary file object; chunked blobs are read through the store.
+        if kind == 'txt':
+            data = f.read(self.max_chars * 4)
+            return normalize(data.decode('utf-8-sig', errors='replace'))[:self.max_chars]
+
+        try:
+            with zipfile.ZipFile(f) as archive:
+                if kind == 'docx':
+                    parts = ['word/document.xml']
+                    paragraph, run = f'{WORD}p', f'{WORD}t'
+                else:
+                    slides = [(int(m.group(1)), m.group(0)) for m in map(SLIDE.fullmatch, archive.namelist()) if m]
+                    parts = [name for _, name in sorted(slides)]
+                    paragraph, run = f'{DRAWING}p', f'{DRAWING}t'
+                return self._paragraphs(archive, parts, paragraph, run, deadline)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            raise JobError(f'Unreadable {kind} file: {e}')
+
+    def _paragraphs(self, archive, parts, paragraph_tag, run_tag, deadline):
+        lines, length = [], 0
+        for name in parts:
+            if archive.getinfo(name).file_size > self.max_part_size:
+                raise JobError(f'{name} is too large to index')
+            with archive.open(name) as f:
+                runs = []
+                for count, (_, element) in enumerate(ElementTree.iterparse(f)):
+                    if count % DEADLINE_STRIDE == 0 and time.monotonic() > deadline:
+                        raise JobTimeout(f'Extraction exceeded its deadline in {name}')
+                    if element.tag == run_tag:
+                        runs.append(element.text or '')
+                    elif element.tag == paragraph_tag:
+                        line = normalize(''.join(runs))
+                        runs = []
+                        # Runs were consumed at their end events.
+                        element.clear()
+                        if line:
+                            lines.append(line)
+                            length += len(line) + 1
+                            if length >= self.max_chars:
+                                return '\n'.join(lines)[:self.max_chars]
+        return '\n'.join(lines)
+
+
+def normalize(text):
+    return re.sub(r'[^\S\n]+', ' ', text.replace('\x00', '')).strip()
+
+
+text_extractor = TextExtractor()
+
+
+@click.command('extract-text')
+@with_appcontext
+def extract_text_command():
+    # Queue extraction for content uploaded before the pipeline existed.
+    resources = Resource.__table__
+    rows = db.session.execute(
+        select(resources.c.file_hash, func.min(resources.c.file_name))
+        .outerjoin(BlobText.__table__, BlobText.file_hash == resources.c.file_hash)
+        .where(BlobText.file_hash.is_(None))
+        .group_by(resources.c.file_hash)
+    ).all()
+    queued = sum(text_extractor.enqueue(file_hash, file_name) for file_hash, file_name in rows)
+    db.session.commit()
+    print(f'Queued text extraction for {queued} files')
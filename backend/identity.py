@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+
+from extensions import db
+from models import User
+
+Identity = namedtuple('Identity', 'id username email full_name field_of_study')
+
+
+# Per-process LRU of user profiles keyed by id. Entries expire after `ttl`
+# seconds, which bounds staleness across workers; updates made through this
+# process invalidate immediately via the mapper hooks below.
+class IdentityCache:
+    def __init__(self, app=None):
+        self.maxsize = 10000
+        self.ttl = 300
+        self.embed_claims = False
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('IDENTITY_CACHE_SIZE', 10000)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 300)
+        self.embed_claims = app.config.get('JWT_PROFILE_CLAIMS', False)
+        app.extensions['identity_cache'] = self
+
+    def get(self, user_id):
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        row = db.session.query(
+            User.id, User.username, User.email, User.full_name, User.field_of_study
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+
+        identity = Identity(*row)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def claims_for(self, user):
+        if not self.embed_claims:
+            return None
+        return {field: getattr(user, field) for field in Identity._fields[1:]}
+
+    def current(self):
+        # Tokens minted with profile claims carry the whole profile, so the
+        # caller's identity costs neither a cache lookup nor a query. Refresh
+        # re-reads the profile when it mints the next token.
+        user_id = get_jwt_identity()
+        claims = get_jwt()
+        if 'username' in claims:
+            return Identity(user_id, *(claims.get(field) for field in Identity._fields[1:]))
+        return self.get(user_id)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+identities = IdentityCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_identity(mapper, connection, target):
+    identities.invalidate(target.id)
@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from extensions import db
+
+# Upper bounds (ms) of the latency histogram buckets reported per route.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+# Opt-in request profiling. Engine cursor events accumulate, per request,
+# the number of statements, time spent in the database, rows fetched and how
+# often each statement text repeated. A statement issued `n_plus_one`
+# times or more in one request is almost always a lazy load inside a loop.
+#
+# Every response gets a Server-Timing header; slow requests and suspected
+# N+1 loops are logged as one JSON object each; per-route samples are kept
+# in a rolling window for /api/_metrics.
+#
+# Must be initialised after `db.init_app`.
+class RequestProfiler:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_ms = 500
+        self.n_plus_one = 5
+        self.window = 1000
+        self.logger = None
+        self._routes = defaultdict(lambda: deque(maxlen=self.window))
+        self._n_plus_one_hits = Counter()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INSTRUMENTATION', False)
+        self.slow_ms = app.config.get('SLOW_REQUEST_MS', 500)
+        self.n_plus_one = app.config.get('N_PLUS_ONE_THRESHOLD', 5)
+        self.window = app.config.get('INSTRUMENTATION_WINDOW', 1000)
+        self.logger = app.logger.getChild('requests')
+        app.extensions['request_profiler'] = self
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        g._profile = {'started': time.perf_counter(), 'statements': 0, 'db_ms': 0.0,
+                      'rows': 0, 'patterns': Counter()}
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and '_profile' in g:
+            conn.info.setdefault('_profile_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not (has_request_context() and '_profile' in g):
+            return
+        profile = g._profile
+        profile['db_ms'] += (time.perf_counter() - conn.info['_profile_started'].pop()) * 1000
+        profile['statements'] += 1
+        profile['patterns'][statement] += 1
+        if cursor.description is None:
+            profile['rows'] += max(cursor.rowcount, 0)
+        elif context is not None:
+            # The result reads through context.cursor, so counting there
+            # sees every row the caller actually fetches.
+            context.cursor = _CountingCursor(cursor, profile)
+
+    def _finish_request(self, response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+
+        total_ms = (time.perf_counter() - profile['started']) * 1000
+        route = f'{request.method} {request.url_rule.rule}' if request.url_rule else f'{request.method} <unmatched>'
+        repeated = [(statement, count) for statement, count in profile['patterns'].most_common(3)
+                    if count >= self.n_plus_one]
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={profile["db_ms"]:.2f};desc="{profile["statements"]} statements, {profile["rows"]} rows", '
+            f'app;dur={total_ms:.2f}'
+        )
+
+        with self._lock:
+            self._routes[route].append((total_ms, profile['db_ms'], profile['statements'], profile['rows']))
+            if repeated:
+                self._n_plus_one_hits[route] += 1
+
+        if total_ms >= self.slow_ms or repeated:
+            self.logger.warning(json.dumps({
+                'event': 'n_plus_one' if repeated else 'slow_request',
+                'route': route,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(total_ms, 2),
+                'db_ms': round(profile['db_ms'], 2),
+                'statements': profile['statements'],
+                'rows': profile['rows'],
+                'repeated': [{'statement': ' '.join(s.split())[:200], 'count': c} for s, c in repeated],
+            }))
+        return response
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            routes = {route: list(samples) for route, samples in self._routes.items()}
+            hits = dict(self._n_plus_one_hits)
+
+        result = {}
+        for route, samples in sorted(routes.items()):
+            durations = sorted(s[0] for s in samples)
+            histogram = Counter(next((b for b in BUCKETS if d <= b), 'inf') for d in durations)
+            result[route] = {
+                'count': len(samples),
+                'p50_ms': round(_percentile(durations, 0.50), 2),
+                'p95_ms': round(_percentile(durations, 0.95), 2),
+                'p99_ms': round(_percentile(durations, 0.99), 2),
+                'histogram_ms': {str(b): histogram.get(b, 0) for b in (*BUCKETS, 'inf')},
+                'db_ms_avg': round(sum(s[1] for s in samples) / len(samples), 2),
+                'statements_max': max(s[2] for s in samples),
+                'rows_max': max(s[3] for s in samples),
+                'n_plus_one': hits.get(route, 0),
+            }
+        return {'enabled': True, 'window': self.window, 'routes': result}
+
+
+class _CountingCursor:
+    def __init__(self, cursor, profile):
+        self._cursor = cursor
+        self._profile = profile
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._profile['rows'] += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._profile['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._profile['rows'] += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+profiler = RequestProfiler()
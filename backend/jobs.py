@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from extensions import db
+from models import Job
+
+# Finished jobs are kept this long for inspection, then purged.
+JOB_RETENTION = timedelta(days=1)
+
+Handler = namedtuple('Handler', 'run timeout max_attempts')
+Claimed = namedtuple('Claimed', 'id kind payload attempts max_attempts')
+
+
+class JobError(Exception):
+    # Raised by handlers for failures that retrying cannot fix.
+    pass
+
+
+class JobTimeout(Exception):
+    pass
+
+
+# Durable background jobs. `enqueue` adds a row in the caller's transaction,
+# so a job exists exactly when the change that asked for it committed.
+#
+# Every process runs up to JOB_WORKERS threads, started on its first request
+# (or by `flask jobs work` in a dedicated process). A thread claims a due row
+# with a conditional UPDATE, which only one claimant can win, and holds it
+# for JOB_LEASE seconds; a job whose lease ran out because its worker died or
+# hung is claimed again. Failures are retried with exponential backoff up to
+# the handler's max_attempts, while JobError fails a job at once.
+#
+# Handlers are called with the payload and a time.monotonic() deadline and
+# commit their own writes. A job runs again if its worker dies before
+# settling it, so handlers must be idempotent. Python threads cannot be
+# interrupted, so the per-job timeout is cooperative: handlers check the
+# deadline and raise JobTimeout, and the lease is the backstop.
+class JobQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = 0
+        self.poll_interval = None
+        self.lease = None
+        self.retry_delay = None
+        self.handlers = {}
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._running = 0
+        self._totals = Counter()
+        self._finished = deque(maxlen=10000)
+        self._purged_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', 2)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self.lease = timedelta(seconds=app.config.get('JOB_LEASE', 120))
+        self.retry_delay = app.config.get('JOB_RETRY_DELAY', 5.0)
+        app.before_request(self._ensure_started)
+        app.cli.add_command(jobs_cli)
+        app.extensions['jobs'] = self
+
+    def register(self, kind, run, timeout=30, max_attempts=3):
+        self.handlers[kind] = Handler(run, timeout, max_attempts)
+
+    def enqueue(self, kind, payload, delay=0):
+        job = Job(
+            kind=kind,
+            payload=payload,
+            status='queued',
+            attempts=0,
+            max_attempts=self.handlers[kind].max_attempts,
+            run_after=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        # Called after the enqueueing transaction commits, so idle workers in
+        # this process pick the job up now rather than at their next poll.
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def work(self, workers=None):
+        # Foreground worker pool for `flask jobs work`.
+        self._start(workers or self.workers or 1)
+        while True:
+            time.sleep(3600)
+
+    def stats(self):
+        depth = dict(db.session.execute(
+            select(Job.status, func.count()).group_by(Job.status)
+        ).all())
+        oldest = db.session.scalar(select(func.min(Job.run_after)).where(Job.status == 'queued'))
+        now = time.monotonic()
+        recent = [seconds for finished_at, seconds in self._finished if now - finished_at <= 60]
+        return {
+            'workers': self.workers if self._pid == os.getpid() else 0,
+            'running': self._running,
+            'queued': depth.get('queued', 0),
+            'by_status': depth,
+            'oldest_queued_s': round(max(0, (datetime.utcnow() - oldest).total_seconds()), 1) if oldest else 0,
+            'completed': self._totals['completed'],
+            'failed': self._totals['failed'],
+            'retried': self._totals['retried'],
+            'timed_out': self._totals['timed_out'],
+            'completed_last_minute': len(recent),
+            'avg_ms_last_minute': round(sum(recent) / len(recent) * 1000, 1) if recent else 0
+        }
+
+    def _ensure_started(self):
+        # Threads are started per process, so a pre-forked worker never
+        # inherits the master's.
+        if self._pid != os.getpid() and self.workers:
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start(self.workers)
+
+    def _start(self, workers):
+        self._pid = os.getpid()
+        self.workers = workers
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True).start()
+
+    def _run(self):
+        owner = f'{os.getpid()}-{threading.current_thread().name}'
+        while True:
+            claimed = None
+            try:
+                with self.app.app_context():
+                    claimed = self._claim(owner)
+                    if claimed:
+                        self._execute(claimed, owner)
+                    else:
+                        self._purge()
+            except Exception:
+                self.app.logger.exception('Job worker failed')
+            if not claimed:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+
+    def _claim(self, owner):
+        now = datetime.utcnow()
+        # A lease always outlasts the longest handler timeout.
+        lease = max(self.lease, timedelta(seconds=2 * max((h.timeout for h in self.handlers.values()), default=0)))
+        claimable = or_(
+            and_(Job.status == 'queued', Job.run_after <= now),
+            and_(Job.status == 'running', Job.locked_until < now)
+        )
+        candidates = db.session.scalars(
+            select(Job.id).where(claimable).order_by(Job.run_after, Job.id).limit(8)
+        ).all()
+        for job_id in candidates:
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, claimable)
+                .values(status='running', locked_by=owner, locked_until=now + lease,
+                        attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                row = db.session.execute(
+                    select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+                    .where(Job.id == job_id)
+                ).one()
+                return Claimed(*row)
+        return None
+
+    def _execute(self, job, owner):
+        handler = self.handlers.get(job.kind)
+        started = time.monotonic()
+        with self._lock:
+            self._running += 1
+        try:
+            if handler is None:
+                raise JobError(f'No handler for {job.kind!r}')
+            if job.attempts > job.max_attempts:
+                raise JobError('Lease expired on the last attempt')
+            handler.run(job.payload, started + handler.timeout)
+        except Exception as e:
+            db.session.rollback()
+            self._failed(job, owner, e)
+        else:
+            self._finish(job, owner, status='done')
+            self._totals['completed'] += 1
+            self._finished.append((time.monotonic(), time.monotonic() - started))
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _failed(self, job, owner, error):
+        if isinstance(error, JobTimeout):
+            self._totals['timed_out'] += 1
+        message = f'{type(error).__name__}: {error}'
+        if isinstance(error, JobError) or job.attempts >= job.max_attempts:
+            self.app.logger.warning('Job %d (%s) failed: %s', job.id, job.kind, message)
+            self._finish(job, owner, status='failed', last_error=message)
+            self._totals['failed'] += 1
+            return
+
+        delay = self.retry_delay * 2 ** (job.attempts - 1)
+        self._finish(job, owner, status='queued', last_error=message,
+                     run_after=datetime.utcnow() + timedelta(seconds=delay), finished_at=None)
+        self._totals['retried'] += 1
+
+    def _finish(self, job, owner, **values):
+        values.setdefault('finished_at', datetime.utcnow())
+        # Only the current lease holder may settle the job.
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.locked_by == owner, Job.status == 'running')
+            .values(locked_by=None, locked_until=None, **values)
+        )
+        db.session.commit()
+
+    def _purge(self):
+        now = time.monotonic()
+        if now - self._purged_at < 3600:
+            return
+        self._purged_at = now
+        db.session.execute(
+            delete(Job).where(
+                Job.status.in_(('done', 'failed')),
+                Job.finished_at < datetime.utcnow() - JOB_RETENTION
+            )
+        )
+        db.session.commit()
+
+
+jobs = JobQueue()
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--workers', type=int, default=None, help='Worker threads (default JOB_WORKERS).')
+def work_command(workers):
+    jobs.work(workers)
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    for key, value in jobs.stats().items():
+        print(f'{key}: {value}')
@@ -0,0 +1,88 @@
+"""background jobs and extracted text in the search index
+
+Revision ID: 0b7e4d2a9c18
+Revises: f3a8c1d7b296
+Create Date: 2026-10-18 21:05:43.902611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e4d2a9c18'
+down_revision = 'f3a8c1d7b296'
+branch_labels = None
+depends_on = None
+
+
+def create_fts(with_body):
+    # FTS5 tables cannot gain columns, so the index is rebuilt.
+    columns = 'title, description, body' if with_body else 'title, description'
+    body = ", coalesce((SELECT content FROM blob_texts WHERE file_hash = new.file_hash), '')" if with_body else ''
+    op.execute("DROP TRIGGER IF EXISTS resources_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS resources_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS resources_fts_ai")
+    op.execute("DROP TABLE IF EXISTS resources_fts")
+    op.execute(
+        f"CREATE VIRTUAL TABLE resources_fts USING fts5("
+        f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER resources_fts_ai AFTER INSERT ON resources BEGIN "
+        f"INSERT INTO resources_fts(rowid, {columns}) "
+        f"VALUES (new.id, new.title, coalesce(new.description, ''){body}); END"
+    )
+    op.execute(
+        "CREATE TRIGGER resources_fts_au AFTER UPDATE OF title, description ON resources BEGIN "
+        "UPDATE resources_fts SET title = new.title, description = coalesce(new.description, '') "
+        "WHERE rowid = new.id; END"
+    )
+    op.execute(
+        "CREATE TRIGGER resources_fts_ad AFTER DELETE ON resources BEGIN "
+        "DELETE FROM resources_fts WHERE rowid = old.id; END"
+    )
+    body = ", coalesce(blob_texts.content, '')" if with_body else ''
+    join = " LEFT JOIN blob_texts ON blob_texts.file_hash = resources.file_hash" if with_body else ''
+    op.execute(
+        f"INSERT INTO resources_fts(rowid, {columns}) "
+        f"SELECT resources.id, resources.title, coalesce(resources.description, ''){body} "
+        f"FROM resources{join}"
+    )
+
+
+def upgrade():
+    op.create_table('blob_texts',
+    sa.Column('file_hash', sa.String(length=64), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('extracted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('file_hash')
+    )
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'], unique=False)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        create_fts(with_body=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        create_fts(with_body=False)
+
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_table('jobs')
+    op.drop_table('blob_texts')
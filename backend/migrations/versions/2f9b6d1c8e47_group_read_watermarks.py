@@ -0,0 +1,60 @@
+"""group message sequence numbers and member read watermarks
+
+Revision ID: 2f9b6d1c8e47
+Revises: 6c2d9e4b7a51
+Create Date: 2026-10-19 00:41:17.208335
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f9b6d1c8e47'
+down_revision = '6c2d9e4b7a51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('messages') as batch_op:
+        batch_op.add_column(sa.Column('seq', sa.Integer(), nullable=True))
+    with op.batch_alter_table('groups') as batch_op:
+        batch_op.add_column(sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_message_id', sa.Integer(), nullable=True))
+    with op.batch_alter_table('group_members') as batch_op:
+        batch_op.add_column(sa.Column('last_read_seq', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_read_message_id', sa.Integer(), nullable=True))
+
+    # Existing messages are numbered in timeline order, and existing members
+    # start caught up.
+    op.execute(
+        "UPDATE messages SET seq = numbered.seq FROM ("
+        "SELECT id, row_number() OVER (PARTITION BY group_id ORDER BY created_at, id) AS seq "
+        "FROM messages WHERE group_id IS NOT NULL) AS numbered "
+        "WHERE numbered.id = messages.id"
+    )
+    op.create_index('ix_messages_group_id_seq', 'messages', ['group_id', 'seq'], unique=True)
+    op.execute(
+        "UPDATE groups SET "
+        "message_count = (SELECT count(*) FROM messages WHERE messages.group_id = groups.id), "
+        "last_message_id = (SELECT id FROM messages WHERE messages.group_id = groups.id "
+        "ORDER BY seq DESC LIMIT 1)"
+    )
+    op.execute(
+        "UPDATE group_members SET "
+        "last_read_seq = (SELECT message_count FROM groups WHERE groups.id = group_members.group_id), "
+        "last_read_message_id = (SELECT last_message_id FROM groups WHERE groups.id = group_members.group_id)"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_messages_group_id_seq', table_name='messages')
+    with op.batch_alter_table('group_members') as batch_op:
+        batch_op.drop_column('last_read_message_id')
+        batch_op.drop_column('last_read_seq')
+    with op.batch_alter_table('groups') as batch_op:
+        batch_op.drop_column('last_message_id')
+        batch_op.drop_column('message_count')
+    with op.batch_alter_table('messages') as batch_op:
+        batch_op.drop_column('seq')
@@ -0,0 +1,24 @@
+"""resources keyset index
+
+Revision ID: 3f1c2a9d4e71
+Revises: b85f903f2589
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d4e71'
+down_revision = 'b85f903f2589'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_resources_created_at_id', 'resources', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_resources_created_at_id', table_name='resources')
@@ -0,0 +1,28 @@
+"""counter segments
+
+Revision ID: 5e9a0b6d2f17
+Revises: c27a5f0e93b4
+Create Date: 2026-10-18 12:40:51.772093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a0b6d2f17'
+down_revision = 'c27a5f0e93b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('counter_segments',
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('applied_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('counter_segments')
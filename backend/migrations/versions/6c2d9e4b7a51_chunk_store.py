@@ -0,0 +1,43 @@
+"""content-defined chunk store
+
+Revision ID: 6c2d9e4b7a51
+Revises: 0b7e4d2a9c18
+Create Date: 2026-10-18 23:12:08.415730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2d9e4b7a51'
+down_revision = '0b7e4d2a9c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chunks',
+    sa.Column('chunk_hash', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('chunk_hash')
+    )
+    op.create_table('blob_chunks',
+    sa.Column('file_hash', sa.String(length=64), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('chunk_hash', sa.String(length=64), nullable=False),
+    sa.Column('offset', sa.BigInteger(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('file_hash', 'seq')
+    )
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.add_column(sa.Column('chunked', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.drop_column('chunked')
+
+    op.drop_table('blob_chunks')
+    op.drop_table('chunks')
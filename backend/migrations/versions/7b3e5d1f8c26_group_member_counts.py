@@ -0,0 +1,35 @@
+"""group member counts and directory indexes
+
+Revision ID: 7b3e5d1f8c26
+Revises: e4f2b9a7c615
+Create Date: 2026-10-18 15:03:27.611482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e5d1f8c26'
+down_revision = 'e4f2b9a7c615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('groups') as batch_op:
+        batch_op.add_column(sa.Column('member_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_groups_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_groups_category_created_at_id', ['category', 'created_at', 'id'], unique=False)
+
+    op.execute(
+        "UPDATE groups SET member_count = ("
+        "SELECT count(*) FROM group_members WHERE group_members.group_id = groups.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('groups') as batch_op:
+        batch_op.drop_index('ix_groups_category_created_at_id')
+        batch_op.drop_index('ix_groups_created_at_id')
+        batch_op.drop_column('member_count')
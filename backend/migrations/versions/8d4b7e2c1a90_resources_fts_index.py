@@ -0,0 +1,54 @@
+"""resources full-text index
+
+Revision ID: 8d4b7e2c1a90
+Revises: 3f1c2a9d4e71
+Create Date: 2026-10-18 10:02:17.530811
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4b7e2c1a90'
+down_revision = '3f1c2a9d4e71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE resources_fts USING fts5("
+        "title, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER resources_fts_ai AFTER INSERT ON resources BEGIN "
+        "INSERT INTO resources_fts(rowid, title, description) "
+        "VALUES (new.id, new.title, coalesce(new.description, '')); END"
+    )
+    op.execute(
+        "CREATE TRIGGER resources_fts_au AFTER UPDATE OF title, description ON resources BEGIN "
+        "UPDATE resources_fts SET title = new.title, description = coalesce(new.description, '') "
+        "WHERE rowid = new.id; END"
+    )
+    op.execute(
+        "CREATE TRIGGER resources_fts_ad AFTER DELETE ON resources BEGIN "
+        "DELETE FROM resources_fts WHERE rowid = old.id; END"
+    )
+    op.execute(
+        "INSERT INTO resources_fts(rowid, title, description) "
+        "SELECT id, title, coalesce(description, '') FROM resources"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS resources_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS resources_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS resources_fts_ai")
+    op.execute("DROP TABLE IF EXISTS resources_fts")
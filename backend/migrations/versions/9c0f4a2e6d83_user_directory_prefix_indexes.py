@@ -0,0 +1,26 @@
+"""user directory prefix indexes
+
+Revision ID: 9c0f4a2e6d83
+Revises: 7b3e5d1f8c26
+Create Date: 2026-10-18 16:21:55.048317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c0f4a2e6d83'
+down_revision = '7b3e5d1f8c26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_username_lower', 'users', [sa.text('lower(username)'), 'id'], unique=False)
+    op.create_index('ix_users_full_name_lower', 'users', [sa.text('lower(full_name)'), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_full_name_lower', table_name='users')
+    op.drop_index('ix_users_username_lower', table_name='users')
@@ -0,0 +1,24 @@
+"""messages group timeline index
+
+Revision ID: a1d6c8e4b352
+Revises: 5e9a0b6d2f17
+Create Date: 2026-10-18 13:31:09.264517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d6c8e4b352'
+down_revision = '5e9a0b6d2f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_messages_group_id_created_at_id', 'messages', ['group_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_messages_group_id_created_at_id', table_name='messages')
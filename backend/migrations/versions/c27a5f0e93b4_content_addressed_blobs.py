@@ -0,0 +1,74 @@
+"""content addressed blobs
+
+Revision ID: c27a5f0e93b4
+Revises: 8d4b7e2c1a90
+Create Date: 2026-10-18 11:26:03.402957
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27a5f0e93b4'
+down_revision = '8d4b7e2c1a90'
+branch_labels = None
+depends_on = None
+
+naming_convention = {
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+}
+
+fts_triggers = [
+    "CREATE TRIGGER IF NOT EXISTS resources_fts_ai AFTER INSERT ON resources BEGIN "
+    "INSERT INTO resources_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, coalesce(new.description, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS resources_fts_au AFTER UPDATE OF title, description ON resources BEGIN "
+    "UPDATE resources_fts SET title = new.title, description = coalesce(new.description, '') "
+    "WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS resources_fts_ad AFTER DELETE ON resources BEGIN "
+    "DELETE FROM resources_fts WHERE rowid = old.id; END",
+]
+
+
+def upgrade():
+    op.create_table('blobs',
+    sa.Column('file_hash', sa.String(length=64), nullable=False),
+    sa.Column('file_size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('file_hash')
+    )
+    op.execute(
+        "INSERT INTO blobs (file_hash, file_size, ref_count, created_at) "
+        "SELECT file_hash, max(file_size), count(*), min(created_at) FROM resources GROUP BY file_hash"
+    )
+
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+    with op.batch_alter_table('resources', naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(
+            'uq_resources_file_hash' if is_sqlite else 'resources_file_hash_key',
+            type_='unique'
+        )
+        batch_op.create_index('ix_resources_file_hash', ['file_hash'], unique=False)
+
+    # Rebuilding the table in batch mode drops the full-text triggers.
+    if is_sqlite:
+        for statement in fts_triggers:
+            op.execute(statement)
+
+
+def downgrade():
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+    with op.batch_alter_table('resources', naming_convention=naming_convention) as batch_op:
+        batch_op.drop_index('ix_resources_file_hash')
+        batch_op.create_unique_constraint(
+            'uq_resources_file_hash' if is_sqlite else 'resources_file_hash_key',
+            ['file_hash']
+        )
+
+    if is_sqlite:
+        for statement in fts_triggers:
+            op.execute(statement)
+
+    op.drop_table('blobs')
@@ -0,0 +1,57 @@
+"""foreign key indexes and unique group membership
+
+Revision ID: d58e1b7a3c49
+Revises: 9c0f4a2e6d83
+Create Date: 2026-10-18 16:48:12.305174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd58e1b7a3c49'
+down_revision = '9c0f4a2e6d83'
+branch_labels = None
+depends_on = None
+
+# messages.group_id is already the leading column of
+# ix_messages_group_id_created_at_id, and group_members.user_id of the
+# unique constraint below.
+indexes = [
+    ('resources', 'user_id'),
+    ('groups', 'created_by'),
+    ('group_members', 'group_id'),
+    ('messages', 'user_id'),
+    ('messages', 'resource_id'),
+    ('direct_messages', 'sender_id'),
+    ('direct_messages', 'receiver_id'),
+    ('direct_messages', 'resource_id'),
+    ('dm_unread_counts', 'peer_id'),
+]
+
+
+def upgrade():
+    for table, column in indexes:
+        op.create_index(f'ix_{table}_{column}', table, [column], unique=False)
+
+    # Drop duplicate memberships left by concurrent joins, keeping the
+    # oldest, and recount the groups they inflated.
+    op.execute(
+        "DELETE FROM group_members WHERE id NOT IN ("
+        "SELECT min(id) FROM group_members GROUP BY user_id, group_id)"
+    )
+    op.execute(
+        "UPDATE groups SET member_count = ("
+        "SELECT count(*) FROM group_members WHERE group_members.group_id = groups.id)"
+    )
+    with op.batch_alter_table('group_members') as batch_op:
+        batch_op.create_unique_constraint('uq_group_members_user_id_group_id', ['user_id', 'group_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('group_members') as batch_op:
+        batch_op.drop_constraint('uq_group_members_user_id_group_id', type_='unique')
+
+    for table, column in reversed(indexes):
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
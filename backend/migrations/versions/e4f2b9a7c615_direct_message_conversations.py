@@ -0,0 +1,70 @@
+"""direct message conversations and unread counters
+
+Revision ID: e4f2b9a7c615
+Revises: a1d6c8e4b352
+Create Date: 2026-10-18 14:18:44.905630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f2b9a7c615'
+down_revision = 'a1d6c8e4b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The initial migration never created direct_messages; databases built
+    # with `db.create_all()` have it, databases built by Alembic do not.
+    if 'direct_messages' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('direct_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('receiver_id', sa.Integer(), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('read', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['receiver_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    with op.batch_alter_table('direct_messages') as batch_op:
+        batch_op.add_column(sa.Column('conversation_key', sa.String(length=32), nullable=True))
+
+    op.execute(
+        "UPDATE direct_messages SET conversation_key = CASE "
+        "WHEN sender_id < receiver_id "
+        "THEN CAST(sender_id AS TEXT) || ':' || CAST(receiver_id AS TEXT) "
+        "ELSE CAST(receiver_id AS TEXT) || ':' || CAST(sender_id AS TEXT) END"
+    )
+
+    with op.batch_alter_table('direct_messages') as batch_op:
+        batch_op.alter_column('conversation_key', existing_type=sa.String(length=32), nullable=False)
+        batch_op.create_index('ix_direct_messages_conversation_key_id', ['conversation_key', 'id'], unique=False)
+
+    op.create_table('dm_unread_counts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('peer_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['peer_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'peer_id')
+    )
+    op.execute(
+        "INSERT INTO dm_unread_counts (user_id, peer_id, count) "
+        "SELECT receiver_id, sender_id, count(*) FROM direct_messages "
+        "WHERE read IS NULL OR read = false GROUP BY receiver_id, sender_id"
+    )
+
+
+def downgrade():
+    op.drop_table('dm_unread_counts')
+    with op.batch_alter_table('direct_messages') as batch_op:
+        batch_op.drop_index('ix_direct_messages_conversation_key_id')
+        batch_op.drop_column('conversation_key')
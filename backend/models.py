@@ -1,5 +1,7 @@
 from datetime import datetime
-from extensions import db, bcrypt
+from sqlalchemy import event, func, select, update
+from extensions import db
+from passwords import hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -19,13 +21,20 @@ class User(db.Model):
     received_direct_messages = db.relationship('DirectMessage', foreign_keys='DirectMessage.receiver_id', backref='receiver', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+# Case-insensitive prefix search over the user directory.
+db.Index('ix_users_username_lower', func.lower(User.username), User.id)
+db.Index('ix_users_full_name_lower', func.lower(User.full_name), User.id)
 
 class Resource(db.Model):
     __tablename__ = 'resources'
+    __table_args__ = (
+        db.Index('ix_resources_created_at_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -33,52 +42,226 @@ class Resource(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_name = db.Column(db.String(200), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
-    file_hash = db.Column(db.String(64), unique=True, nullable=False)
+    file_hash = db.Column(db.String(64), nullable=False, index=True)
     download_count = db.Column(db.Integer, default=0)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     messages = db.relationship('Message', backref='resource', lazy=True)
     direct_messages = db.relationship('DirectMessage', backref='resource', lazy=True)
 
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+    file_hash = db.Column(db.String(64), primary_key=True)
+    file_size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set once the content lives in the chunk store (STORAGE_MODE=chunked).
+    chunked = db.Column(db.Boolean, nullable=False, default=False)
+
+# A blob's manifest: its chunks in order.
+class BlobChunk(db.Model):
+    __tablename__ = 'blob_chunks'
+    file_hash = db.Column(db.String(64), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)
+    chunk_hash = db.Column(db.String(64), nullable=False)
+    offset = db.Column(db.BigInteger, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+
+class Chunk(db.Model):
+    __tablename__ = 'chunks'
+    chunk_hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    # One reference per manifest entry.
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+
+class CounterSegment(db.Model):
+    __tablename__ = 'counter_segments'
+    name = db.Column(db.String(120), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Text extracted from a blob's content, shared by every resource with that hash.
+class BlobText(db.Model):
+    __tablename__ = 'blob_texts'
+    file_hash = db.Column(db.String(64), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    # queued -> running -> done | failed; retries go back to queued.
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    file_name = db.Column(db.String(200), nullable=False)
+    file_size = db.Column(db.Integer, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    # Optional digest declared by the client, checked when the upload is finalized.
+    sha256 = db.Column(db.String(64), nullable=True)
+    # Length of the prefix the running digest has covered so far.
+    hashed_offset = db.Column(db.Integer, nullable=False, default=0)
+    title = db.Column(db.String(200), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    category = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class UploadChunk(db.Model):
+    __tablename__ = 'upload_chunks'
+    session_id = db.Column(db.String(32), db.ForeignKey('upload_sessions.id'), primary_key=True)
+    chunk_index = db.Column(db.Integer, primary_key=True)
+
 class Group(db.Model):
     __tablename__ = 'groups'
+    __table_args__ = (
+        db.Index('ix_groups_created_at_id', 'created_at', 'id'),
+        db.Index('ix_groups_category_created_at_id', 'category', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     category = db.Column(db.String(50), nullable=False)
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by the GroupMember insert/delete hooks below.
+    member_count = db.Column(db.Integer, nullable=False, default=0)
+    # Maintained by the Message insert hooks below; message_count is also
+    # the seq of the newest message.
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    last_message_id = db.Column(db.Integer, nullable=True)
     
     members = db.relationship('GroupMember', back_populates='group')
     messages = db.relationship('Message', backref='group', lazy=True)
 
 class GroupMember(db.Model):
     __tablename__ = 'group_members'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'group_id', name='uq_group_members_user_id_group_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False, index=True)
     role = db.Column(db.String(20), default='member')
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Read watermark: unread = groups.message_count - last_read_seq.
+    last_read_seq = db.Column(db.Integer, nullable=False, default=0)
+    last_read_message_id = db.Column(db.Integer, nullable=True)
     
     user = db.relationship('User', back_populates='group_memberships')
     group = db.relationship('Group', back_populates='members')
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_group_id_created_at_id', 'group_id', 'created_at', 'id'),
+        db.Index('ix_messages_group_id_seq', 'group_id', 'seq', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=True)
-    resource_id = db.Column(db.Integer, db.ForeignKey('resources.id'), nullable=True)
+    # 1, 2, 3, ... within the group, assigned on insert.
+    seq = db.Column(db.Integer, nullable=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resources.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class DirectMessage(db.Model):
     __tablename__ = 'direct_messages'
+    __table_args__ = (
+        db.Index('ix_direct_messages_conversation_key_id', 'conversation_key', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    receiver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    resource_id = db.Column(db.Integer, db.ForeignKey('resources.id'), nullable=True)
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    # "<lower user id>:<higher user id>", the same for both directions.
+    conversation_key = db.Column(db.String(32), nullable=False)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resources.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    read = db.Column(db.Boolean, default=False)
\ No newline at end of file
+    read = db.Column(db.Boolean, default=False)
+
+class UnreadCount(db.Model):
+    __tablename__ = 'dm_unread_counts'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    peer_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _adjust_member_count(connection, group_id, delta):
+    groups = Group.__table__
+    connection.execute(
+        update(groups)
+        .where(groups.c.id == group_id)
+        .values(member_count=groups.c.member_count + delta)
+    )
+
+@event.listens_for(GroupMember, 'before_insert')
+def _start_watermark(mapper, connection, target):
+    # New members start caught up rather than with the whole history unread.
+    if target.last_read_seq is None:
+        groups = Group.__table__
+        row = connection.execute(
+            select(groups.c.message_count, groups.c.last_message_id).where(groups.c.id == target.group_id)
+        ).first()
+        if row:
+            target.last_read_seq, target.last_read_message_id = row
+
+@event.listens_for(GroupMember, 'after_insert')
+def _member_joined(mapper, connection, target):
+    _adjust_member_count(connection, target.group_id, 1)
+
+@event.listens_for(GroupMember, 'after_delete')
+def _member_left(mapper, connection, target):
+    _adjust_member_count(connection, target.group_id, -1)
+
+@event.listens_for(Message, 'before_insert')
+def _assign_seq(mapper, connection, target):
+    # The UPDATE takes the group row's write lock, so concurrent senders
+    # cannot be handed the same seq.
+    if target.group_id is None:
+        return
+    groups = Group.__table__
+    target.seq = connection.scalar(
+        update(groups)
+        .where(groups.c.id == target.group_id)
+        .values(message_count=groups.c.message_count + 1)
+        .returning(groups.c.message_count)
+    )
+
+@event.listens_for(Message, 'after_insert')
+def _message_posted(mapper, connection, target):
+    if target.seq is not None:
+        groups = Group.__table__
+        connection.execute(
+            update(groups)
+            .where(groups.c.id == target.group_id)
+            .values(last_message_id=target.id)
+        )
+        # The sender has read their own message.
+        members = GroupMember.__table__
+        connection.execute(
+            update(members)
+            .where(
+                members.c.group_id == target.group_id,
+                members.c.user_id == target.user_id,
+                members.c.last_read_seq < target.seq
+            )
+            .values(last_read_seq=target.seq, last_read_message_id=target.id)
+        )
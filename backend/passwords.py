@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from extensions import bcrypt
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+# bcrypt is deliberately slow. Running it on a small dedicated pool (the
+# library releases the GIL while hashing) keeps a login storm from tying up
+# every request thread; once the pool and its queue are full, callers get
+# HashingOverloaded straight away and the API answers 503.
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 2
+        self.max_queue = 8
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._samples = {'hash': deque(maxlen=1000), 'verify': deque(maxlen=1000), 'queue_wait': deque(maxlen=1000)}
+        self._rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS') or min(4, os.cpu_count() or 1)
+        self.max_queue = app.config.get('PASSWORD_HASH_MAX_QUEUE', self.workers * 4)
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        return self._submit('hash', lambda: bcrypt.generate_password_hash(password, self.rounds).decode('utf-8'))
+
+    def verify(self, password_hash, password):
+        return self._submit('verify', lambda: bcrypt.check_password_hash(password_hash, password))
+
+    def needs_rehash(self, password_hash):
+        # "$2b$<cost>$<salt+hash>"
+        try:
+            return int(password_hash.split('$')[2]) < self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'rejected': self._rejected,
+                **{f'{name}_ms': _summarize(samples) for name, samples in self._samples.items()}
+            }
+
+    def _ensure_executor(self):
+        # Created on first use so pre-forked workers each get their own pool.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hasher')
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+                self._pid = os.getpid()
+
+    def _submit(self, kind, fn):
+        self._ensure_executor()
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise HashingOverloaded()
+
+        queued_at = time.perf_counter()
+
+        def run():
+            started_at = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                finished_at = time.perf_counter()
+                with self._stats_lock:
+                    self._samples['queue_wait'].append((started_at - queued_at) * 1000)
+                    self._samples[kind].append((finished_at - started_at) * 1000)
+
+        try:
+            return self._executor.submit(run).result()
+        finally:
+            self._slots.release()
+
+
+def _summarize(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'p50': round(ordered[len(ordered) // 2], 2),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max': round(ordered[-1], 2),
+    }
+
+
+hasher = PasswordHasher()
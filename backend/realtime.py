@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+from conversations import conversation_key
+
+Event = namedtuple('Event', 'id channel type data')
+
+
+def group_channel(group_id):
+    return f'group:{group_id}'
+
+
+def dm_channel(user_id, peer_id):
+    return f'dm:{conversation_key(user_id, peer_id)}'
+
+
+# Brokers hand out monotonically increasing event ids so subscribers can
+# resume with Last-Event-ID. `fetch` blocks until something newer than
+# `after_id` is published on the channel or `timeout` expires.
+#
+# Every group and conversation gets its own channel, so channels nobody is
+# waiting on are dropped once their newest event is older than `retention`
+# (the same replay window SQLiteBroker keeps); at most once a minute, from
+# `publish`.
+class MemoryBroker:
+    def __init__(self, history=500, retention=3600):
+        self.history = history
+        self.retention = retention
+        self._events = {}
+        self._published_at = {}
+        self._waiting = Counter()
+        self._swept_at = time.monotonic()
+        self._last_id = 0
+        self._cond = threading.Condition()
+
+    def publish(self, channel, type, data):
+        with self._cond:
+            self._last_id += 1
+            event = Event(self._last_id, channel, type, data)
+            events = self._events.get(channel)
+            if events is None:
+                events = self._events[channel] = deque(maxlen=self.history)
+            events.append(event)
+            now = time.monotonic()
+            self._published_at[channel] = now
+            if now - self._swept_at > 60:
+                self._sweep(now)
+            self._cond.notify_all()
+            return event.id
+
+    def latest_id(self):
+        return self._last_id
+
+    def fetch(self, channel, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiting[channel] += 1
+            try:
+                while True:
+                    events = [e for e in self._events.get(channel, ()) if e.id > after_id]
+                    remaining = deadline - time.monotonic()
+                    if events or remaining <= 0:
+                        return events
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting[channel] -= 1
+                if not self._waiting[channel]:
+                    del self._waiting[channel]
+
+    def _sweep(self, now):
+        self._swept_at = now
+        for channel, published_at in list(self._published_at.items()):
+            if now - published_at > self.retention and channel not in self._waiting:
+                del self._events[channel]
+                del self._published_at[channel]
+
+
+# Multi-process stand-in: every worker publishes into and polls one local
+# SQLite file, so a subscriber connected to one worker sees messages sent
+# through another.
+class SQLiteBroker:
+    def __init__(self, path, poll_interval=0.25, retention=3600):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, '
+                'type TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_events_channel_id ON events (channel, id)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def publish(self, channel, type, data):
+        conn = self._connect()
+        now = time.time()
+        cursor = conn.execute(
+            'INSERT INTO events (channel, type, data, created_at) VALUES (?, ?, ?, ?)',
+            (channel, type, json.dumps(data), now)
+        )
+        if cursor.lastrowid % 1000 == 0:
+            conn.execute('DELETE FROM events WHERE created_at < ?', (now - self.retention,))
+        return cursor.lastrowid
+
+    def latest_id(self):
+        row = self._connect().execute('SELECT max(id) FROM events').fetchone()
+        return row[0] or 0
+
+    def fetch(self, channel, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        conn = self._connect()
+        while True:
+            rows = conn.execute(
+                'SELECT id, channel, type, data FROM events WHERE channel = ? AND id > ? ORDER BY id',
+                (channel, after_id)
+            ).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [Event(id, ch, type, json.loads(data)) for id, ch, type, data in rows]
+            time.sleep(self.poll_interval)
+
+
+class EventHub:
+    def __init__(self, app=None):
+        self.broker = None
+        self.heartbeat = 15
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('EVENT_BROKER', 'memory')
+        if backend == 'memory':
+            self.broker = MemoryBroker(history=app.config.get('EVENT_HISTORY', 500))
+        elif backend == 'sqlite':
+            path = app.config.get('EVENT_BROKER_PATH') or os.path.join(app.instance_path, 'events.db')
+            self.broker = SQLiteBroker(path)
+        else:
+            raise ValueError(f'Unknown EVENT_BROKER {backend!r}')
+        self.heartbeat = app.config.get('EVENT_HEARTBEAT', 15)
+        app.extensions['event_hub'] = self
+
+    def publish(self, channel, type, data):
+        return self.broker.publish(channel, type, data)
+
+    def stream(self, channel, last_event_id=None):
+        # Server-Sent Events. Without a Last-Event-ID the subscriber starts
+        # from "now"; comments keep idle connections from being reaped.
+        after_id = self.broker.latest_id() if last_event_id is None else last_event_id
+        yield 'retry: 3000\n\n'
+        while True:
+            events = self.broker.fetch(channel, after_id, self.heartbeat)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                after_id = event.id
+                yield f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n'
+
+
+hub = EventHub()
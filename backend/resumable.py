@@ -0,0 +1,271 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from extensions import db
+from models import UploadChunk, UploadSession
+
+READ_SIZE = 64 * 1024
+
+
+class IncompleteChunk(Exception):
+    pass
+
+
+# Resumable uploads. A session preallocates a part file next to the content
+# store; numbered chunks of a fixed size are written at their offsets in any
+# order and recorded in `upload_chunks`, so a client that lost its
+# connection asks which ranges arrived and resends only the rest.
+#
+# The SHA-256 runs alongside: a chunk that lands exactly where the digest
+# stopped is hashed while it is written, and chunks that arrived early are
+# folded in from the part file once the gap before them fills. Finalizing
+# therefore only reads a digest. hashlib cannot serialize its state, so the
+# digest lives in the worker's memory and the session only persists the
+# offset it has reached; a worker without it (after a restart, or when the
+# chunks of one session are spread over several workers) rehashes the
+# received prefix from the part file.
+#
+# A chunk is hashed into a copy of the digest, which the caller applies with
+# `commit_digest` only once the chunk's row is committed. A chunk whose
+# transaction fails therefore never reaches the digest and is hashed once
+# when it is resent.
+class _Digest:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+        self.used_at = time.monotonic()
+
+
+class PartFile:
+    # What ContentStore.put expects of an upload.
+    def __init__(self, path):
+        self.path = path
+
+    def commit(self, destination):
+        os.replace(self.path, destination)
+        self.path = None
+
+    def discard(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+class UploadSessions:
+    def __init__(self, app=None):
+        self.directory = None
+        self.chunk_size = None
+        self.ttl = None
+        self.max_size = None
+        self.per_user = None
+        self._lock = threading.Lock()
+        self._digests = {}
+        self._collected_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = os.path.join(app.config['UPLOAD_FOLDER'], '.sessions')
+        self.chunk_size = app.config.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+        self.ttl = timedelta(seconds=app.config.get('UPLOAD_SESSION_TTL', 24 * 3600))
+        self.max_size = app.config.get('MAX_UPLOAD_SIZE', 2 * 1024 ** 3)
+        self.per_user = app.config.get('UPLOAD_SESSIONS_PER_USER', 8)
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['upload_sessions'] = self
+
+    def part_path(self, session_id):
+        return os.path.join(self.directory, f'{session_id}.part')
+
+    def chunk_count(self, session):
+        return -(-session.file_size // session.chunk_size)
+
+    def chunk_length(self, session, index):
+        return min(session.chunk_size, session.file_size - index * session.chunk_size)
+
+    def open_count(self, user_id):
+        # Expired sessions wait for collection but no longer count.
+        return db.session.scalar(
+            select(func.count(UploadSession.id))
+            .where(UploadSession.user_id == user_id,
+                   UploadSession.updated_at >= datetime.utcnow() - self.ttl)
+        )
+
+    def create(self, user_id, file_name, file_size, **fields):
+        self.collect_expired(throttle=True)
+        session = UploadSession(
+            id=secrets.token_hex(16),
+            user_id=user_id,
+            file_name=file_name,
+            file_size=file_size,
+            chunk_size=self.chunk_size,
+            hashed_offset=0,
+            **fields
+        )
+        with open(self.part_path(session.id), 'wb') as f:
+            f.truncate(file_size)
+        db.session.add(session)
+        return session
+
+    def received(self, session):
+        # End-exclusive byte ranges, coalesced.
+        ranges = []
+        for index in db.session.scalars(
+            select(UploadChunk.chunk_index)
+            .where(UploadChunk.session_id == session.id)
+            .order_by(UploadChunk.chunk_index)
+        ):
+            start = index * session.chunk_size
+            end = start + self.chunk_length(session, index)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def has_chunk(self, session, index):
+        return db.session.get(UploadChunk, (session.id, index)) is not None
+
+    def write_chunk(self, session, index, stream):
+        # Returns the digest state the chunk leads to, for `commit_digest`
+        # once the caller has committed.
+        offset = index * session.chunk_size
+        length = self.chunk_length(session, index)
+        digest = self._digest(session.id)
+        with digest.lock:
+            base = digest.offset
+            sha256 = digest.sha256.copy()
+        inline = base == offset
+        self._write(session, offset, length, stream, sha256 if inline else None)
+
+        db.session.add(UploadChunk(session_id=session.id, chunk_index=index))
+        session.updated_at = datetime.utcnow()
+        end = self._fold(session, sha256, base + length if inline else base)
+        self._record_offset(session, end)
+        return digest, base, sha256, end
+
+    def commit_digest(self, staged):
+        # Another chunk of the session may have moved the digest meanwhile;
+        # its state then wins and this chunk is folded in from the part file
+        # by a later `advance`.
+        digest, base, sha256, end = staged
+        with digest.lock:
+            if digest.offset == base:
+                digest.sha256 = sha256
+                digest.offset = end
+
+    def advance(self, session):
+        # Hash whatever contiguous committed prefix has arrived beyond the
+        # digest.
+        digest = self._digest(session.id)
+        with digest.lock:
+            digest.offset = self._fold(session, digest.sha256, digest.offset)
+            offset = digest.offset
+        self._record_offset(session, offset)
+        return digest
+
+    def finish(self, session):
+        # Returns the digest and the assembled file, or None while chunks are
+        # missing. The session rows go in the caller's transaction.
+        if self.received(session) != [[0, session.file_size]]:
+            return None
+        digest = self.advance(session)
+        with digest.lock:
+            file_hash = digest.sha256.hexdigest()
+        return file_hash, self.close(session)
+
+    def close(self, session):
+        # Deletes the session in the caller's transaction and hands back its
+        # part file, to be committed to the store or discarded.
+        db.session.execute(delete(UploadChunk).where(UploadChunk.session_id == session.id))
+        db.session.delete(session)
+        with self._lock:
+            self._digests.pop(session.id, None)
+        return PartFile(self.part_path(session.id))
+
+    def collect_expired(self, throttle=False):
+        # Sessions nobody has written to within the TTL are abandoned. Called
+        # opportunistically when sessions are created (at most once a minute
+        # per process) and by `flask purge-upload-sessions`.
+        now = time.monotonic()
+        if throttle and now - self._collected_at < 60:
+            return 0
+        self._collected_at = now
+
+        with self._lock:
+            for session_id, digest in list(self._digests.items()):
+                if now - digest.used_at > self.ttl.total_seconds():
+                    del self._digests[session_id]
+
+        expired = db.session.scalars(
+            select(UploadSession.id)
+            .where(UploadSession.updated_at < datetime.utcnow() - self.ttl)
+        ).all()
+        if expired:
+            db.session.execute(delete(UploadChunk).where(UploadChunk.session_id.in_(expired)))
+            db.session.execute(delete(UploadSession).where(UploadSession.id.in_(expired)))
+            db.session.commit()
+            for session_id in expired:
+                PartFile(self.part_path(session_id)).discard()
+        return len(expired)
+
+    def _digest(self, session_id):
+        with self._lock:
+            digest = self._digests.get(session_id)
+            if digest is None:
+                digest = self._digests[session_id] = _Digest()
+            digest.used_at = time.monotonic()
+            return digest
+
+    def _fold(self, session, sha256, start):
+        frontier = self._frontier(session, start)
+        if frontier > start:
+            with open(self.part_path(session.id), 'rb') as f:
+                f.seek(start)
+                remaining = frontier - start
+                while remaining:
+                    data = f.read(min(remaining, READ_SIZE))
+                    sha256.update(data)
+                    remaining -= len(data)
+        return frontier
+
+    def _record_offset(self, session, offset):
+        db.session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == session.id, UploadSession.hashed_offset < offset)
+            .values(hashed_offset=offset)
+        )
+
+    def _frontier(self, session, start):
+        expected = start // session.chunk_size
+        for index in db.session.scalars(
+            select(UploadChunk.chunk_index)
+            .where(UploadChunk.session_id == session.id, UploadChunk.chunk_index >= expected)
+            .order_by(UploadChunk.chunk_index)
+        ):
+            if index != expected:
+                break
+            expected += 1
+        return min(expected * session.chunk_size, session.file_size)
+
+    def _write(self, session, offset, length, stream, sha256):
+        with open(self.part_path(session.id), 'r+b') as f:
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                data = stream.read(min(remaining, READ_SIZE))
+                if not data:
+                    raise IncompleteChunk(f'Chunk ended {remaining} bytes short')
+                f.write(data)
+                if sha256 is not None:
+                    sha256.update(data)
+                remaining -= len(data)
+
+
+upload_sessions = UploadSessions()
@@ -0,0 +1,106 @@
+import re
+
+import sqlalchemy as sa
+from sqlalchemy import DDL, event
+
+from extensions import db
+from models import BlobText, Resource
+from serializers import RESOURCE, fetch, resources, users
+
+# Full-text index over resource titles, descriptions and the text extracted
+# from their files. On SQLite this is an FTS5 table kept in sync with
+# `resources` by triggers, so upload, PATCH and DELETE never have to touch it
+# explicitly; the body comes from `blob_texts`, filled in by the extraction
+# job (see extraction.py) once it has run, or right away when another
+# resource with the same content was indexed before. Other databases fall
+# back to a LIKE scan until they get a native index.
+FTS_TABLE = 'resources_fts'
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS resources_fts_ai AFTER INSERT ON resources BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description, body) "
+    "VALUES (new.id, new.title, coalesce(new.description, ''), "
+    "coalesce((SELECT content FROM blob_texts WHERE file_hash = new.file_hash), '')); END",
+    f"CREATE TRIGGER IF NOT EXISTS resources_fts_au AFTER UPDATE OF title, description ON resources BEGIN "
+    f"UPDATE {FTS_TABLE} SET title = new.title, description = coalesce(new.description, '') "
+    "WHERE rowid = new.id; END",
+    f"CREATE TRIGGER IF NOT EXISTS resources_fts_ad AFTER DELETE ON resources BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+]
+
+# Title matches weigh more than description matches.
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+BODY_WEIGHT = 0.5
+
+fts = sa.table(FTS_TABLE, sa.column('rowid'))
+blob_texts = BlobText.__table__
+
+for statement in FTS_DDL:
+    event.listen(Resource.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(
+    Resource.__table__, 'before_drop',
+    DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite')
+)
+
+
+def match_expression(query):
+    # Quote every term so user input can never be parsed as FTS5 syntax and
+    # make each one a prefix match: "calc lin" finds "Calculus" and "Linear".
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_resources(query, category=None, uploader_id=None, limit=20, offset=0):
+    if db.engine.dialect.name == 'sqlite':
+        expression = match_expression(query)
+        if not expression:
+            return []
+        score = sa.func.bm25(sa.literal_column(FTS_TABLE), TITLE_WEIGHT, DESCRIPTION_WEIGHT, BODY_WEIGHT)
+        stmt = (
+            RESOURCE.select()
+            .select_from(
+                fts.join(resources, resources.c.id == fts.c.rowid)
+                .join(users, resources.c.user_id == users.c.id)
+            )
+            .where(sa.text(f'{FTS_TABLE} MATCH :expression').bindparams(expression=expression))
+            .order_by(score, resources.c.id)
+        )
+    else:
+        pattern = f'%{query}%'
+        stmt = (
+            RESOURCE.select()
+            .select_from(
+                resources.join(users, resources.c.user_id == users.c.id)
+                .outerjoin(blob_texts, blob_texts.c.file_hash == resources.c.file_hash)
+            )
+            .where(sa.or_(
+                resources.c.title.ilike(pattern),
+                resources.c.description.ilike(pattern),
+                blob_texts.c.content.ilike(pattern)
+            ))
+            .order_by(resources.c.created_at.desc(), resources.c.id.desc())
+        )
+
+    if category:
+        stmt = stmt.where(resources.c.category == category)
+    if uploader_id is not None:
+        stmt = stmt.where(resources.c.user_id == uploader_id)
+
+    return fetch(stmt.limit(limit).offset(offset))
+
+
+def index_body(file_hash, text):
+    # The insert trigger only sees text that already existed; resources
+    # uploaded before their content was extracted are updated here.
+    if db.engine.dialect.name != 'sqlite':
+        return
+    db.session.execute(
+        sa.text(
+            f'UPDATE {FTS_TABLE} SET body = :body '
+            'WHERE rowid IN (SELECT id FROM resources WHERE file_hash = :file_hash)'
+        ),
+        {'body': text, 'file_hash': file_hash}
+    )
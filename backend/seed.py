@@ -1,11 +1,12 @@
-from app import app
+from app import create_app
 from extensions import db
-from models import User, Resource, Group, GroupMember, Message, DirectMessage
-import os
-import hashlib
+from collections import Counter
+from models import User, Resource, Blob, Group, GroupMember, Message, DirectMessage, UnreadCount
+from storage import storage
+from conversations import conversation_key
 
 def seed_database():
-    with app.app_context():
+    with create_app().app_context():
         db.drop_all()
         db.create_all()
         
@@ -27,28 +28,24 @@ def seed_database():
         # Create resources
         resources = []
         categories = ['Math', 'Science', 'History', 'Art', 'Programming']
+        blobs = []
         for i in range(1, 6):
-            dummy_file_path = os.path.join(app.config['UPLOAD_FOLDER'], f'dummy_{i}.txt')
-            with open(dummy_file_path, 'w') as f:
-                f.write(f'Dummy resource content {i}')
-                
-            sha256 = hashlib.sha256()
-            with open(dummy_file_path, 'rb') as f:
-                while chunk := f.read(4096):
-                    sha256.update(chunk)
-            file_hash = sha256.hexdigest()
+            content = f'Dummy resource content {i}'.encode('utf-8')
+            file_hash, file_path = storage.put_bytes(content)
+            blobs.append(Blob(file_hash=file_hash, file_size=len(content), ref_count=1))
             
             resources.append(Resource(
                 title=f'Resource {i}',
                 description=f'Description for resource {i}',
                 category=categories[i % len(categories)],
-                file_path=dummy_file_path,
+                file_path=file_path,
                 file_name=f'dummy_{i}.txt',
-                file_size=os.path.getsize(dummy_file_path),
+                file_size=len(content),
                 file_hash=file_hash,
                 user_id=users[i % len(users)].id
             ))
         
+        db.session.add_all(blobs)
         db.session.add_all(resources)
         db.session.commit()
 
@@ -120,16 +117,23 @@ def seed_database():
                 direct_messages.append(DirectMessage(
                     content=f"Hi {receiver.username}, can you help me with the assignment?",
                     sender_id=sender.id,
-                    receiver_id=receiver.id
+                    receiver_id=receiver.id,
+                    conversation_key=conversation_key(sender.id, receiver.id)
                 ))
                 
                 direct_messages.append(DirectMessage(
                     content=f"Sure {sender.username}, what do you need help with?",
                     sender_id=receiver.id,
-                    receiver_id=sender.id
+                    receiver_id=sender.id,
+                    conversation_key=conversation_key(sender.id, receiver.id)
                 ))
         
         db.session.add_all(direct_messages)
+        unread = Counter((m.receiver_id, m.sender_id) for m in direct_messages)
+        db.session.add_all([
+            UnreadCount(user_id=user_id, peer_id=peer_id, count=count)
+            for (user_id, peer_id), count in unread.items()
+        ])
         db.session.commit()
 
         print("Database seeded successfully!")
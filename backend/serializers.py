@@ -0,0 +1,126 @@
+import sqlalchemy as sa
+
+from extensions import db
+from models import User, Resource, Group, GroupMember, Message, DirectMessage
+
+users = User.__table__
+resources = Resource.__table__
+groups = Group.__table__
+group_members = GroupMember.__table__
+messages = Message.__table__
+direct_messages = DirectMessage.__table__
+senders = users.alias('sender')
+receivers = users.alias('receiver')
+
+
+# Public JSON shapes of the list endpoints, each defined once as
+# (key, column) pairs over plain tables. Statements built from them run on
+# the session's connection as Core selects, so list requests never load
+# Model instances or touch the identity map; the rows that come back are
+# SQLAlchemy's slotted Row tuples, and a function generated per shape turns
+# each one into a dict by position.
+class Shape:
+    def __init__(self, name, *fields):
+        self.name = name
+        self.keys = [key for key, _ in fields]
+        self.columns = [column.label(key) for key, column in fields]
+        self.serialize = _compile(name, fields)
+
+    def select(self, *extra):
+        # Extra columns (sort keys and the like) go after the shape's own,
+        # so the serializer never sees them.
+        return sa.select(*self.columns, *extra)
+
+    def many(self, rows):
+        return list(map(self.serialize, rows))
+
+
+def _compile(name, fields):
+    items = []
+    for i, (key, column) in enumerate(fields):
+        value = f'row[{i}]'
+        if isinstance(column.type, sa.DateTime):
+            value = f'({value}.isoformat() if {value} is not None else None)'
+        items.append(f'{key!r}: {value}')
+    source = f"def serialize_{name}(row):\n    return {{{', '.join(items)}}}\n"
+    namespace = {}
+    exec(compile(source, f'<shape {name}>', 'exec'), namespace)
+    return namespace[f'serialize_{name}']
+
+
+def fetch(stmt):
+    return db.session.connection().execute(stmt).all()
+
+
+RESOURCE = Shape(
+    'resource',
+    ('id', resources.c.id),
+    ('title', resources.c.title),
+    ('description', resources.c.description),
+    ('category', resources.c.category),
+    ('file_name', resources.c.file_name),
+    ('file_size', resources.c.file_size),
+    ('download_count', resources.c.download_count),
+    ('uploader_id', resources.c.user_id),
+    ('uploader', users.c.username),
+    ('created_at', resources.c.created_at),
+)
+
+GROUP = Shape(
+    'group',
+    ('id', groups.c.id),
+    ('name', groups.c.name),
+    ('description', groups.c.description),
+    ('category', groups.c.category),
+    ('created_by', users.c.username),
+    ('member_count', groups.c.member_count),
+    ('created_at', groups.c.created_at),
+)
+
+# The caller's membership of a group, with its unread count and a preview
+# of the newest message (latest_* are null in an empty group).
+MEMBER_GROUP = Shape(
+    'member_group',
+    ('id', groups.c.id),
+    ('name', groups.c.name),
+    ('category', groups.c.category),
+    ('member_count', groups.c.member_count),
+    ('role', group_members.c.role),
+    ('unread', groups.c.message_count - group_members.c.last_read_seq),
+    ('last_read_message_id', group_members.c.last_read_message_id),
+    ('latest_message_id', messages.c.id),
+    ('latest_message_preview', sa.func.substr(messages.c.content, 1, 140)),
+    ('latest_message_sender', users.c.username),
+    ('latest_message_at', messages.c.created_at),
+)
+
+GROUP_MESSAGE = Shape(
+    'group_message',
+    ('id', messages.c.id),
+    ('content', messages.c.content),
+    ('sender', users.c.username),
+    ('resource_id', messages.c.resource_id),
+    ('resource_title', resources.c.title),
+    ('created_at', messages.c.created_at),
+)
+
+DIRECT_MESSAGE = Shape(
+    'direct_message',
+    ('id', direct_messages.c.id),
+    ('content', direct_messages.c.content),
+    ('sender_id', direct_messages.c.sender_id),
+    ('sender_username', senders.c.username),
+    ('receiver_id', direct_messages.c.receiver_id),
+    ('receiver_username', receivers.c.username),
+    ('resource_id', direct_messages.c.resource_id),
+    ('created_at', direct_messages.c.created_at),
+    ('read', direct_messages.c.read),
+)
+
+USER_SUMMARY = Shape(
+    'user_summary',
+    ('id', users.c.id),
+    ('username', users.c.username),
+    ('full_name', users.c.full_name),
+    ('field_of_study', users.c.field_of_study),
+)
@@ -0,0 +1,218 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+# Pre-fork production launcher. The master binds the listening socket and
+# forks N workers that each serve it with a threaded WSGI server; the kernel
+# spreads accepted connections between them.
+#
+# With --preload the master builds the app once and workers inherit it
+# copy-on-write, so forking is nearly free. Building the app opens no
+# connections, and each worker drops whatever pool state it inherited before
+# serving, so no database connection is ever shared across processes.
+# Without --preload every worker builds its own app after the fork.
+#
+#   SIGHUP          re-exec the master on the same socket, so new code and
+#                   config are loaded; it starts a fresh set of workers and
+#                   then drains the old ones
+#   SIGTERM/SIGINT  drain all workers and exit
+#
+# Workers share nothing in memory, so with more than one of them the response
+# cache and event broker must use their sqlite backends; they default to them
+# here, and an explicit `memory` is refused.
+#
+# A draining worker stops accepting, finishes in-flight requests and exits;
+# anything still running after --graceful-timeout (e.g. open event streams)
+# is killed.
+log = logging.getLogger('serve')
+
+
+class Worker:
+    def __init__(self, sock, app, args):
+        self.sock = sock
+        self.app = app
+        self.args = args
+        self.server = None
+
+    def run(self):
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        app = self.app
+        if app is None:
+            from app import create_app
+            app = create_app()
+
+        from extensions import db
+        with app.app_context():
+            for engine in db.engines.values():
+                # Forget connections inherited from the master without
+                # closing them under its feet.
+                engine.dispose(close=False)
+
+        host, port = self.sock.getsockname()[:2]
+        self.server = make_server(host, port, app, threaded=True, fd=self.sock.fileno())
+        # Non-daemon request threads, so server_close() waits for them.
+        self.server.daemon_threads = False
+        log.info('worker %d ready', os.getpid())
+        self.server.serve_forever()
+        self.server.server_close()
+        log.info('worker %d exited', os.getpid())
+
+    def _stop(self, signum, frame):
+        if self.server is not None:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class Master:
+    def __init__(self, args):
+        self.args = args
+        self.sock = None
+        self.app = None
+        self.workers = {}
+        self.draining = {}
+        self.signals = []
+        self.stopping = False
+
+    def run(self):
+        started = time.perf_counter()
+        if self.args.workers > 1:
+            _use_shared_backends()
+        # Set by _reload in the master this process was before its exec.
+        inherited_fd = os.environ.pop('SERVE_LISTEN_FD', None)
+        previous = [int(pid) for pid in os.environ.pop('SERVE_PREVIOUS_WORKERS', '').split(',') if pid]
+        if inherited_fd:
+            self.sock = socket.socket(fileno=int(inherited_fd))
+        else:
+            host, port = self.args.bind.rsplit(':', 1)
+            self.sock = socket.create_server((host, int(port)), backlog=self.args.backlog)
+        self.sock.set_inheritable(True)
+
+        if self.args.preload:
+            from app import create_app
+            self.app = create_app()
+        log.info('master %d listening on %s, booted in %.0f ms',
+                 os.getpid(), self.args.bind, (time.perf_counter() - started) * 1000)
+
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, lambda signum, frame: self.signals.append(signum))
+
+        self._spawn(self.args.workers)
+        # Workers of the old code are still our children after the exec.
+        self._drain(previous)
+        while self.workers or self.draining:
+            while self.signals:
+                self._handle(self.signals.pop(0))
+            self._reap()
+            self._kill_overdue()
+            time.sleep(0.2)
+        self.sock.close()
+        log.info('master %d exited', os.getpid())
+
+    def _handle(self, signum):
+        if signum == signal.SIGHUP and not self.stopping:
+            self._reload()
+        elif signum in (signal.SIGTERM, signal.SIGINT):
+            log.info('shutting down')
+            self.stopping = True
+            self._drain(list(self.workers))
+
+    def _reload(self):
+        # A preloaded app (and every imported module) lives in this process,
+        # so only a fresh interpreter picks up new code. Check that the new
+        # code builds before replacing ourselves with it.
+        check = subprocess.run(
+            [sys.executable, '-c', 'from app import create_app; create_app()'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+        )
+        if check.returncode != 0:
+            log.error('reload aborted, the new code does not start:\n%s', check.stderr.strip())
+            return
+        log.info('reloading %d workers', len(self.workers))
+        os.environ['SERVE_LISTEN_FD'] = str(self.sock.fileno())
+        os.environ['SERVE_PREVIOUS_WORKERS'] = ','.join(map(str, [*self.workers, *self.draining]))
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        os.execv(sys.executable, [sys.executable, os.path.abspath(sys.argv[0]), *sys.argv[1:]])
+
+    def _spawn(self, count):
+        for _ in range(count):
+            pid = os.fork()
+            if pid == 0:
+                Worker(self.sock, self.app, self.args).run()
+                sys.exit(0)
+            self.workers[pid] = time.monotonic()
+
+    def _drain(self, pids):
+        deadline = time.monotonic() + self.args.graceful_timeout
+        for pid in pids:
+            self.workers.pop(pid, None)
+            self.draining[pid] = deadline
+            _signal(pid, signal.SIGTERM)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.draining.pop(pid, None) is not None:
+                continue
+            if self.workers.pop(pid, None) is not None and not self.stopping:
+                log.warning('worker %d died (status %d), restarting', pid, status)
+                self._spawn(1)
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.draining.items()):
+            if now > deadline:
+                log.warning('worker %d did not drain in time, killing', pid)
+                _signal(pid, signal.SIGKILL)
+                self.draining[pid] = float('inf')
+
+
+
+def _use_shared_backends():
+    # The in-memory cache is only invalidated in the worker that served the
+    # write, and the in-memory broker only reaches that worker's streams.
+    from dotenv import load_dotenv
+    load_dotenv()
+    for name in ('RESPONSE_CACHE', 'EVENT_BROKER'):
+        if os.environ.get(name) == 'memory':
+            sys.exit(f'{name}=memory cannot be shared between workers; use {name}=sqlite or --workers 1')
+        os.environ.setdefault(name, 'sqlite')
+
+
+def _signal(pid, signum):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the API with pre-forked worker processes.')
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--preload', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--graceful-timeout', type=float, default=30)
+    parser.add_argument('--backlog', type=int, default=2048)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(process)d] %(message)s')
+    Master(args).run()
+
+
+if __name__ == '__main__':
+    main()
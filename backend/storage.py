@@ -0,0 +1,479 @@
+import hashlib
+import io
+import mimetypes
+import os
+import time
+from bisect import bisect_right
+from collections import Counter
+
+import click
+from flask import current_app, request, send_file
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.wsgi import wrap_file
+
+import chunking
+from extensions import db
+from jobs import JobError, JobTimeout, jobs
+from models import Blob, BlobChunk, BlobText, Chunk, Resource
+
+STORAGE_MODES = ('whole', 'chunked')
+READ_SIZE = 64 * 1024
+
+
+# Uploads are stored once per distinct content, named by their SHA-256 and
+# sharded two levels deep (ab/cd/abcd...) so no directory grows unbounded.
+# Resources reference blobs through the `blobs` table, whose ref_count decides
+# when the bytes on disk can go.
+#
+# With STORAGE_MODE=chunked, new blobs are additionally split by a
+# `chunk_blob` job into content-defined chunks (see chunking.py) kept under
+# chunks/, each stored once however many files share it. The blob's manifest
+# (blob_chunks) lists its chunks in order, and downloads are streamed back
+# from them. Chunks are counted per manifest entry; a chunk whose count drops
+# to zero is deleted by a delayed `sweep_chunks` job, which leaves alone any
+# file touched within CHUNK_SWEEP_DELAY by a concurrent writer.
+class ContentStore:
+    def __init__(self, app=None):
+        self.root = None
+        self.mode = None
+        self.sendfile_mode = None
+        self.sendfile_prefix = None
+        self.chunk_sizes = None
+        self.sweep_delay = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config['UPLOAD_FOLDER']
+        self.mode = app.config.get('STORAGE_MODE', 'whole')
+        self.sendfile_mode = app.config.get('SENDFILE_MODE') or None
+        self.sendfile_prefix = app.config.get('SENDFILE_PREFIX', '/protected-uploads/')
+        if self.mode not in STORAGE_MODES:
+            raise ValueError(f'Unknown STORAGE_MODE {self.mode!r}')
+        if self.sendfile_mode not in (None, 'x-accel-redirect', 'x-sendfile'):
+            raise ValueError(f'Unknown SENDFILE_MODE {self.sendfile_mode!r}')
+        self.chunk_sizes = (
+            app.config.get('CHUNK_MIN_SIZE', 16 * 1024),
+            app.config.get('CHUNK_AVG_SIZE', 64 * 1024),
+            app.config.get('CHUNK_MAX_SIZE', 256 * 1024)
+        )
+        self.sweep_delay = app.config.get('CHUNK_SWEEP_DELAY', 600)
+        os.makedirs(self.root, exist_ok=True)
+        # Registered in either mode: blobs chunked earlier still need sweeping.
+        jobs.register(
+            'chunk_blob', self._run_chunk,
+            timeout=app.config.get('CHUNK_JOB_TIMEOUT', 300),
+            max_attempts=3
+        )
+        jobs.register('sweep_chunks', self._run_sweep, timeout=60, max_attempts=3)
+        app.cli.add_command(storage_cli)
+        app.extensions['content_store'] = self
+
+    def path(self, file_hash):
+        return os.path.join(self.root, file_hash[:2], file_hash[2:4], file_hash)
+
+    def chunk_path(self, chunk_hash):
+        return os.path.join(self.root, 'chunks', chunk_hash[:2], chunk_hash[2:4], chunk_hash)
+
+    def exists(self, file_hash):
+        return os.path.exists(self.path(file_hash)) or self.is_chunked(file_hash)
+
+    def is_chunked(self, file_hash):
+        return bool(db.session.scalar(select(Blob.chunked).where(Blob.file_hash == file_hash)))
+
+    def put(self, upload, file_hash, created=False):
+        # Called after `acquire`. When that created the blob row, a delete of
+        # the previous blob with this hash may just have unlinked its file,
+        # so the bytes are always written then; see `remove`.
+        path = self.path(file_hash)
+        if not created and self.exists(file_hash):
+            upload.discard()
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        upload.commit(path)
+        return path
+
+    def put_bytes(self, data):
+        file_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(file_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return file_hash, path
+
+    def adopt(self, legacy_path, file_hash):
+        path = self.path(file_hash)
+        if os.path.exists(path):
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(legacy_path, path)
+        return path
+
+    def locate(self, resource):
+        # Rows written before the store existed still point at a flat file.
+        path = self.path(resource.file_hash)
+        if not os.path.exists(path):
+            path = resource.file_path
+        return os.path.abspath(path)
+
+    def open(self, resource):
+        # A binary, seekable file object over the content in either form.
+        try:
+            return open(self.locate(resource), 'rb')
+        except FileNotFoundError:
+            return self.open_chunked(resource.file_hash)
+
+    def open_chunked(self, file_hash):
+        blob = db.session.get(Blob, file_hash)
+        if blob is None or not blob.chunked:
+            raise FileNotFoundError(f'No content stored for {file_hash}')
+        manifest = db.session.execute(
+            select(BlobChunk.offset, BlobChunk.size, BlobChunk.chunk_hash)
+            .where(BlobChunk.file_hash == file_hash)
+            .order_by(BlobChunk.seq)
+        ).all()
+        return io.BufferedReader(ChunkedReader(self, manifest, blob.file_size), READ_SIZE)
+
+    def send(self, resource):
+        # Content is immutable per hash, so the hash is a strong validator.
+        # Werkzeug answers If-None-Match with a 304 and Range with a 206.
+        path = self.locate(resource)
+        if self.sendfile_mode is None:
+            try:
+                return send_file(
+                    path,
+                    as_attachment=True,
+                    download_name=resource.file_name,
+                    etag=resource.file_hash,
+                    conditional=True
+                )
+            except FileNotFoundError:
+                return self._send_chunked(resource)
+
+        if not os.path.exists(path):
+            # The proxy only sees whole files; chunked content is streamed here.
+            return self._send_chunked(resource)
+
+        # Let the front proxy stream the bytes (and serve ranges) while the
+        # worker only answers with headers.
+        mimetype = mimetypes.guess_type(resource.file_name)[0] or 'application/octet-stream'
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers.set('Content-Disposition', 'attachment', filename=resource.file_name)
+        response.set_etag(resource.file_hash)
+        response.cache_control.no_cache = True
+        if self.sendfile_mode == 'x-accel-redirect':
+            relative = os.path.relpath(path, os.path.abspath(self.root)).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = self.sendfile_prefix.rstrip('/') + '/' + relative
+        else:
+            response.headers['X-Sendfile'] = path
+        return response.make_conditional(request)
+
+    def _send_chunked(self, resource):
+        reader = self.open_chunked(resource.file_hash)
+        size = reader.raw.size
+        mimetype = mimetypes.guess_type(resource.file_name)[0] or 'application/octet-stream'
+        response = current_app.response_class(
+            wrap_file(request.environ, reader, READ_SIZE),
+            mimetype=mimetype,
+            direct_passthrough=True
+        )
+        response.content_length = size
+        response.headers.set('Content-Disposition', 'attachment', filename=resource.file_name)
+        response.set_etag(resource.file_hash)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request, accept_ranges=True, complete_length=size)
+
+    def acquire(self, file_hash, file_size):
+        # Returns True when this created the blob row. The row is flushed at
+        # once so that it is ordered against `remove` before any bytes are
+        # written.
+        updated = db.session.execute(
+            update(Blob)
+            .where(Blob.file_hash == file_hash)
+            .values(ref_count=Blob.ref_count + 1)
+        ).rowcount
+        if updated:
+            return False
+        db.session.add(Blob(file_hash=file_hash, file_size=file_size, ref_count=1))
+        db.session.flush()
+        if self.mode == 'chunked':
+            jobs.enqueue('chunk_blob', {'file_hash': file_hash})
+        return True
+
+    def release(self, file_hash):
+        # Returns True when this was the last reference. The caller removes
+        # the bytes with `remove` only after its transaction has committed.
+        db.session.execute(
+            update(Blob)
+            .where(Blob.file_hash == file_hash)
+            .values(ref_count=Blob.ref_count - 1)
+        )
+        orphaned = db.session.execute(
+            delete(Blob).where(Blob.file_hash == file_hash, Blob.ref_count <= 0)
+        ).rowcount > 0
+        if orphaned:
+            db.session.execute(delete(BlobText).where(BlobText.file_hash == file_hash))
+            self._release_chunks(file_hash)
+        return orphaned
+
+    def _release_chunks(self, file_hash):
+        counts = Counter(db.session.scalars(
+            select(BlobChunk.chunk_hash).where(BlobChunk.file_hash == file_hash)
+        ))
+        if not counts:
+            return
+        db.session.execute(delete(BlobChunk).where(BlobChunk.file_hash == file_hash))
+        for chunk_hash, count in counts.items():
+            db.session.execute(
+                update(Chunk)
+                .where(Chunk.chunk_hash == chunk_hash)
+                .values(ref_count=Chunk.ref_count - count)
+            )
+        dead = list(db.session.scalars(
+            select(Chunk.chunk_hash).where(Chunk.chunk_hash.in_(list(counts)), Chunk.ref_count <= 0)
+        ))
+        if dead:
+            db.session.execute(delete(Chunk).where(Chunk.chunk_hash.in_(dead)))
+            jobs.enqueue('sweep_chunks', {'chunks': dead}, delay=self.sweep_delay)
+
+    def chunk(self, file_hash, deadline=None):
+        # Moves a whole-file blob into the chunk store. Safe to repeat: the
+        # manifest is written together with `chunked`, and the whole file is
+        # only removed after that commit.
+        blob = db.session.get(Blob, file_hash)
+        if blob is None:
+            return False
+        path = self.path(file_hash)
+        if blob.chunked:
+            if os.path.exists(path):
+                os.remove(path)
+            return False
+        if not os.path.exists(path):
+            raise JobError(f'{file_hash} is not in the content store; run `flask relocate-uploads`')
+
+        manifest, offset = [], 0
+        with open(path, 'rb') as f:
+            for data in chunking.split(f, *self.chunk_sizes):
+                if deadline is not None and time.monotonic() > deadline:
+                    raise JobTimeout(f'Chunking {file_hash} exceeded its deadline')
+                chunk_hash = hashlib.sha256(data).hexdigest()
+                self._write_chunk(chunk_hash, data)
+                manifest.append({
+                    'file_hash': file_hash,
+                    'seq': len(manifest),
+                    'chunk_hash': chunk_hash,
+                    'offset': offset,
+                    'size': len(data)
+                })
+                offset += len(data)
+
+        claimed = db.session.execute(
+            update(Blob)
+            .where(Blob.file_hash == file_hash, Blob.chunked.is_(False))
+            .values(chunked=True)
+        ).rowcount
+        if not claimed:
+            # Released (or chunked by someone else) meanwhile.
+            db.session.rollback()
+            jobs.enqueue('sweep_chunks', {'chunks': sorted({m['chunk_hash'] for m in manifest})},
+                         delay=self.sweep_delay)
+            db.session.commit()
+            return False
+        if manifest:
+            db.session.execute(insert(BlobChunk), manifest)
+        sizes = {m['chunk_hash']: m['size'] for m in manifest}
+        for chunk_hash, count in Counter(m['chunk_hash'] for m in manifest).items():
+            updated = db.session.execute(
+                update(Chunk)
+                .where(Chunk.chunk_hash == chunk_hash)
+                .values(ref_count=Chunk.ref_count + count)
+            ).rowcount
+            if not updated:
+                db.session.add(Chunk(chunk_hash=chunk_hash, size=sizes[chunk_hash], ref_count=count))
+        db.session.commit()
+        os.remove(path)
+        return True
+
+    def _write_chunk(self, chunk_hash, data):
+        path = self.chunk_path(chunk_hash)
+        try:
+            # Touching a shared chunk keeps a pending sweep off it.
+            os.utime(path)
+            return
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _run_chunk(self, payload, deadline):
+        self.chunk(payload['file_hash'], deadline)
+
+    def _run_sweep(self, payload, deadline):
+        live = set(db.session.scalars(
+            select(Chunk.chunk_hash).where(Chunk.chunk_hash.in_(payload['chunks']))
+        ))
+        cutoff = time.time() - self.sweep_delay
+        for chunk_hash in payload['chunks']:
+            if chunk_hash in live:
+                continue
+            path = self.chunk_path(chunk_hash)
+            try:
+                if os.stat(path).st_mtime <= cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        # Bytes as uploaded, as kept after whole-file dedupe, and on disk.
+        resource_bytes = db.session.scalar(select(func.coalesce(func.sum(Resource.file_size), 0)))
+        whole_bytes, chunked_bytes = db.session.execute(
+            select(
+                func.coalesce(func.sum(Blob.file_size).filter(Blob.chunked.is_(False)), 0),
+                func.coalesce(func.sum(Blob.file_size).filter(Blob.chunked.is_(True)), 0)
+            )
+        ).one()
+        chunk_count, chunk_bytes = db.session.execute(
+            select(func.count(), func.coalesce(func.sum(Chunk.size), 0))
+        ).one()
+        stored_bytes = whole_bytes + chunk_bytes
+        return {
+            'mode': self.mode,
+            'resource_bytes': resource_bytes,
+            'blob_bytes': whole_bytes + chunked_bytes,
+            'stored_bytes': stored_bytes,
+            'chunked_blob_bytes': chunked_bytes,
+            'chunk_count': chunk_count,
+            'chunk_bytes': chunk_bytes,
+            'dedupe_ratio': round(resource_bytes / stored_bytes, 3) if stored_bytes else 1.0,
+            'chunk_dedupe_ratio': round(chunked_bytes / chunk_bytes, 3) if chunk_bytes else 1.0
+        }
+
+    def remove(self, file_hash, legacy_path=None):
+        # Runs after the releasing transaction committed, so an upload of the
+        # same bytes may have re-created the blob since. A placeholder row
+        # claims the hash while the file is unlinked: it conflicts with a
+        # blob row created first (whose bytes are then kept), and an upload
+        # that comes after waits for it and writes its bytes afresh.
+        try:
+            db.session.add(Blob(file_hash=file_hash, file_size=0, ref_count=0))
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        for path in (self.path(file_hash), legacy_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        db.session.execute(delete(Blob).where(Blob.file_hash == file_hash, Blob.ref_count <= 0))
+        db.session.commit()
+        return True
+
+
+# A read-only view of a chunked blob as one file, for `open`. Reads within
+# one chunk at a time; BufferedReader on top turns them into full reads.
+class ChunkedReader(io.RawIOBase):
+    def __init__(self, store, manifest, size):
+        self.store = store
+        self.manifest = manifest
+        self.offsets = [offset for offset, _, _ in manifest]
+        self.size = size
+        self._pos = 0
+        self._index = None
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError('Negative seek position')
+        self._pos = offset
+        return offset
+
+    def readinto(self, buffer):
+        if self._pos >= self.size:
+            return 0
+        index = bisect_right(self.offsets, self._pos) - 1
+        offset, size, chunk_hash = self.manifest[index]
+        if index != self._index:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.store.chunk_path(chunk_hash), 'rb')
+            self._index = index
+        self._file.seek(self._pos - offset)
+        read = self._file.readinto(memoryview(buffer)[:offset + size - self._pos])
+        if not read:
+            raise OSError(f'Chunk {chunk_hash} is truncated')
+        self._pos += read
+        return read
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+storage = ContentStore()
+
+storage_cli = AppGroup('storage', help='Inspect and convert the content store.')
+
+
+@storage_cli.command('stats')
+def stats_command():
+    for key, value in storage.stats().items():
+        print(f'{key}: {value}')
+
+
+@storage_cli.command('estimate')
+def estimate_command():
+    # What chunking the whole-file blobs would save, without writing anything.
+    seen, total, unique = set(), 0, 0
+    for file_hash in db.session.scalars(select(Blob.file_hash).where(Blob.chunked.is_(False))):
+        path = storage.path(file_hash)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            for data in chunking.split(f, *storage.chunk_sizes):
+                chunk_hash = hashlib.sha256(data).digest()
+                total += len(data)
+                if chunk_hash not in seen:
+                    seen.add(chunk_hash)
+                    unique += len(data)
+    ratio = round(total / unique, 3) if unique else 1.0
+    print(f'{total} blob bytes would be stored as {unique} bytes in {len(seen)} chunks (ratio {ratio})')
+
+
+@storage_cli.command('chunk')
+@click.option('--limit', type=int, default=None, help='Convert at most this many blobs.')
+def chunk_command(limit):
+    # Convert existing whole-file blobs in the foreground.
+    query = select(Blob.file_hash).where(Blob.chunked.is_(False)).order_by(Blob.file_hash)
+    if limit:
+        query = query.limit(limit)
+    converted = 0
+    for file_hash in list(db.session.scalars(query)):
+        try:
+            converted += storage.chunk(file_hash)
+        except JobError as e:
+            print(e)
+    print(f'Chunked {converted} blobs')
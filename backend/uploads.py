@@ -0,0 +1,52 @@
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+
+
+# Werkzeug streams each multipart file part into whatever the request's
+# stream factory returns. Spooling straight into the upload folder and
+# hashing on the way means an upload hits the disk once and is never read
+# back just to compute its SHA-256.
+class HashingUploadFile:
+    def __init__(self, directory):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def commit(self, destination):
+        self._file.close()
+        os.replace(self.path, destination)
+        self.path = None
+
+    def discard(self):
+        self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload = HashingUploadFile(current_app.config['UPLOAD_FOLDER'])
+        self.__dict__.setdefault('pending_uploads', []).append(upload)
+        return upload
+
+
+def discard_pending_uploads(request):
+    # Anything a view did not commit is a rejected or duplicate upload.
+    for upload in request.__dict__.get('pending_uploads', ()):
+        upload.discard()
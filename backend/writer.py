@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from extensions import db
+
+# Batch sizes are counted in power-of-two buckets: 1, 2, 4, ... up to 512.
+HISTOGRAM_BUCKETS = tuple(2 ** i for i in range(10))
+
+
+class _Pending:
+    __slots__ = ('write', 'done', 'result', 'error')
+
+    def __init__(self, write):
+        self.write = write
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Group commit for chat inserts (MESSAGE_BATCHING). On SQLite every commit is
+# an fsync under the one write lock, so a burst of single-row transactions
+# is bounded by fsyncs rather than by the inserts themselves. With batching
+# on, `write` hands the insert to a per-process writer thread instead, which
+# collects inserts for up to MESSAGE_BATCH_WINDOW_MS or MESSAGE_BATCH_SIZE
+# rows, runs them in one transaction, and only then wakes each caller with
+# its result. A request is therefore acknowledged only once its row is
+# durable, exactly as before.
+#
+# `write` is called with no arguments inside the batch transaction and must
+# return plain values (ids, timestamps), not ORM objects: it runs on the
+# writer's session, which is committed and closed before the caller resumes.
+# If the batch fails, each write is retried in its own transaction so one bad
+# row only fails its own request.
+class GroupCommitWriter:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.window = None
+        self.max_batch = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._batches = Counter()
+        self._rows = 0
+        self._retried = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('MESSAGE_BATCHING', False)
+        self.window = app.config.get('MESSAGE_BATCH_WINDOW_MS', 5) / 1000
+        self.max_batch = app.config.get('MESSAGE_BATCH_SIZE', 64)
+        app.extensions['message_writer'] = self
+
+    def write(self, write):
+        if not self.enabled:
+            result = write()
+            db.session.commit()
+            self._record(1)
+            return result
+
+        self._ensure_started()
+        pending = _Pending(write)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        batches = sum(self._batches.values())
+        # Buckets are listed in order; `le: null` holds the larger batches.
+        histogram = [
+            {'le': bucket, 'batches': self._batches.get(bucket, 0)}
+            for bucket in HISTOGRAM_BUCKETS + (None,)
+        ]
+        return {
+            'enabled': self.enabled,
+            'window_ms': round(self.window * 1000, 3) if self.window is not None else None,
+            'max_batch': self.max_batch,
+            'batches': batches,
+            'rows': self._rows,
+            'avg_batch': round(self._rows / batches, 2) if batches else 0,
+            'retried_batches': self._retried,
+            'batch_sizes': histogram
+        }
+
+    def _record(self, size):
+        bucket = next((b for b in HISTOGRAM_BUCKETS if size <= b), None)
+        with self._lock:
+            self._batches[bucket] += 1
+            self._rows += size
+
+    def _ensure_started(self):
+        # One writer per process, so a pre-forked worker never inherits
+        # the master's thread (or its queue).
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, name='message-writer', daemon=True).start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with self.app.app_context():
+                    self._commit(batch)
+            except Exception as e:
+                self.app.logger.exception('Message writer failed')
+                for pending in batch:
+                    if pending.result is None and pending.error is None:
+                        pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def _commit(self, batch):
+        try:
+            results = [pending.write() for pending in batch]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._retried += 1
+            for pending in batch:
+                try:
+                    pending.result = pending.write()
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    pending.error = e
+                self._record(1)
+            return
+
+        for pending, result in zip(batch, results):
+            pending.result = result
+        self._record(len(batch))
+
+
+message_writer = GroupCommitWriter()
@@ -13,6 +13,7 @@ const ChatPage = () => {
   const [group, setGroup] = useState(null);
   const [loading, setLoading] = useState(true);
   const [file, setFile] = useState(null);
+  const [hasEarlier, setHasEarlier] = useState(true);
   const messagesEndRef = useRef(null);
   const { currentUser } = useAuth();
 
@@ -36,10 +37,53 @@ const ChatPage = () => {
     fetchGroupData();
   }, [groupId]);
 
+  const fetchNewMessages = async () => {
+    const lastId = messages.length > 0 ? messages[messages.length - 1].id : null;
+    const response = await api.get('/api/messages', {
+      params: lastId ? { group_id: groupId, since_id: lastId } : { group_id: groupId }
+    });
+    if (response.data.length > 0) {
+      setMessages(prev => [...prev, ...response.data.filter(m => !prev.some(p => p.id === m.id))]);
+    }
+  };
+
+  const handleLoadEarlier = async () => {
+    if (messages.length === 0) return;
+    try {
+      const response = await api.get('/api/messages', {
+        params: { group_id: groupId, before_id: messages[0].id }
+      });
+      setHasEarlier(response.data.length > 0);
+      setMessages(prev => [...response.data, ...prev]);
+    } catch (error) {
+      console.error('Error fetching earlier messages:', error);
+    }
+  };
+
+  useEffect(() => {
+    if (loading) return;
+    const token = localStorage.getItem('access_token');
+    const source = new EventSource(
+      `${api.defaults.baseURL}/api/stream?group_id=${groupId}&jwt=${encodeURIComponent(token)}`
+    );
+    source.addEventListener('message', event => {
+      const message = JSON.parse(event.data);
+      setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+    });
+    return () => source.close();
+  }, [loading, groupId]);
+
   useEffect(() => {
     scrollToBottom();
   }, [messages]);
 
+  // Everything on screen counts as read; the server ignores stale watermarks.
+  const newestId = messages.length > 0 ? messages[messages.length - 1].id : null;
+  useEffect(() => {
+    if (!newestId) return;
+    api.put(`/api/me/groups/${groupId}/read`, { message_id: newestId }).catch(() => {});
+  }, [newestId, groupId]);
+
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
@@ -66,13 +110,13 @@ const ChatPage = () => {
         resourceId = resourceResponse.data.resource.id;
       }
       
-      const messageResponse = await api.post('/api/messages', {
+      await api.post('/api/messages', {
         content: newMessage,
         group_id: groupId,
         resource_id: resourceId
       });
       
-      setMessages([...messages, messageResponse.data]);
+      await fetchNewMessages();
       setNewMessage('');
       setFile(null);
     } catch (error) {
@@ -101,6 +145,11 @@ const ChatPage = () => {
         </div>
         
         <div className="chat-messages">
+          {hasEarlier && messages.length > 0 && (
+            <button onClick={handleLoadEarlier} className="load-earlier">
+              Load earlier messages
+            </button>
+          )}
           {messages.map((message) => (
             <MessageBubble 
               key={message.id} 
@@ -9,17 +9,33 @@ const DirectMessagesPage = () => {
   const [selectedUser, setSelectedUser] = useState(null);
   const [newMessage, setNewMessage] = useState('');
   const [users, setUsers] = useState([]);
+  const [userQuery, setUserQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [unread, setUnread] = useState({});
   const [loading, setLoading] = useState(true);
 
+  const fetchUsers = async (query, cursor) => {
+    const response = await api.get('/api/users', {
+      params: { q: query || undefined, cursor: cursor || undefined }
+    });
+    const page = response.data.users.filter(user => user.id !== currentUser.id);
+    setUsers(prev => cursor ? [...prev, ...page] : page);
+    setNextCursor(response.data.next_cursor);
+    return page;
+  };
+
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const usersResponse = await api.get('/api/users');
-        const filteredUsers = usersResponse.data.filter(user => user.id !== currentUser.id);
-        setUsers(filteredUsers);
+        const page = await fetchUsers('');
         
-        if (filteredUsers.length > 0) {
-          setSelectedUser(filteredUsers[0]);
+        const unreadResponse = await api.get('/api/direct-messages/unread');
+        setUnread(Object.fromEntries(
+          unreadResponse.data.peers.map(peer => [peer.peer_id, peer.unread])
+        ));
+        
+        if (page.length > 0) {
+          setSelectedUser(page[0]);
         }
         setLoading(false);
       } catch (error) {
@@ -31,6 +47,25 @@ const DirectMessagesPage = () => {
     fetchData();
   }, [currentUser]);
 
+  useEffect(() => {
+    if (loading) return;
+    const timeout = setTimeout(() => {
+      fetchUsers(userQuery.trim()).catch(error => {
+        console.error('Error searching users:', error);
+      });
+    }, 250);
+    
+    return () => clearTimeout(timeout);
+  }, [userQuery]);
+
+  const handleLoadMoreUsers = async () => {
+    try {
+      await fetchUsers(userQuery.trim(), nextCursor);
+    } catch (error) {
+      console.error('Error fetching users:', error);
+    }
+  };
+
   useEffect(() => {
     const fetchMessages = async () => {
       if (!selectedUser) return;
@@ -43,6 +78,8 @@ const DirectMessagesPage = () => {
           }
         });
         setMessages(response.data);
+        await api.post('/api/direct-messages/read', { peer_id: selectedUser.id });
+        setUnread(prev => ({ ...prev, [selectedUser.id]: 0 }));
       } catch (error) {
         console.error('Error fetching messages:', error);
       }
@@ -51,16 +88,28 @@ const DirectMessagesPage = () => {
     fetchMessages();
   }, [selectedUser, currentUser]);
 
+  useEffect(() => {
+    if (!selectedUser) return;
+    const token = localStorage.getItem('access_token');
+    const source = new EventSource(
+      `${api.defaults.baseURL}/api/stream?peer_id=${selectedUser.id}&jwt=${encodeURIComponent(token)}`
+    );
+    source.addEventListener('direct_message', event => {
+      const message = JSON.parse(event.data);
+      setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+    });
+    return () => source.close();
+  }, [selectedUser]);
+
   const handleSendMessage = async () => {
     if (!newMessage.trim() || !selectedUser) return;
     
     try {
-      const response = await api.post('/api/direct-messages', {
+      await api.post('/api/direct-messages', {
         content: newMessage,
         receiver_id: selectedUser.id
       });
       
-      setMessages([...messages, response.data]);
       setNewMessage('');
     } catch (error) {
       console.error('Error sending message:', error);
@@ -85,6 +134,14 @@ const DirectMessagesPage = () => {
       <div className="dm-container">
         <div className="user-list">
           <h3>Students</h3>
+          <div className="search-box">
+            <input
+              type="text"
+              placeholder="Search students..."
+              value={userQuery}
+              onChange={(e) => setUserQuery(e.target.value)}
+            />
+          </div>
           {users.map(user => (
             <div 
               key={user.id} 
@@ -96,8 +153,16 @@ const DirectMessagesPage = () => {
                 <div className="username">{user.username}</div>
                 <div className="field">{user.field_of_study}</div>
               </div>
+              {unread[user.id] > 0 && (
+                <span className="unread-badge">{unread[user.id]}</span>
+              )}
             </div>
           ))}
+          {nextCursor && (
+            <button onClick={handleLoadMoreUsers} className="btn btn-outline">
+              Load more
+            </button>
+          )}
         </div>
         
         <div className="message-container">
@@ -5,6 +5,7 @@ import { motion } from 'framer-motion';
 
 const GroupPage = () => {
   const [groups, setGroups] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [newGroup, setNewGroup] = useState({
     name: '',
@@ -13,18 +14,21 @@ const GroupPage = () => {
   });
   const [showForm, setShowForm] = useState(false);
 
-  useEffect(() => {
-    const fetchGroups = async () => {
-      try {
-        const response = await api.get('/api/groups');
-        setGroups(response.data);
-      } catch (error) {
-        console.error('Error fetching groups:', error);
-      } finally {
-        setLoading(false);
-      }
-    };
+  const fetchGroups = async (after = null) => {
+    try {
+      const response = await api.get('/api/groups', {
+        params: after ? { after } : {}
+      });
+      setGroups(prev => after ? [...prev, ...response.data.groups] : response.data.groups);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching groups:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
 
+  useEffect(() => {
     fetchGroups();
   }, []);
 
@@ -138,6 +142,14 @@ const GroupPage = () => {
           </div>
         )}
       </div>
+
+      {nextCursor && (
+        <div className="load-more">
+          <button onClick={() => fetchGroups(nextCursor)} className="btn btn-primary">
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -1,18 +1,29 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import ResourceCard from '../components/ResourceCard';
 import api from '../services/api';
 
 const LibraryPage = () => {
   const [resources, setResources] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
   const [categoryFilter, setCategoryFilter] = useState('all');
+  const [searchResults, setSearchResults] = useState(null);
+  const sentinelRef = useRef(null);
+
+  const fetchResources = async (after = null) => {
+    const response = await api.get('/api/resources', {
+      params: after ? { after } : {}
+    });
+    setResources(prev => after ? [...prev, ...response.data.resources] : response.data.resources);
+    setNextCursor(response.data.next_cursor);
+  };
 
   useEffect(() => {
-    const fetchResources = async () => {
+    const loadFirstPage = async () => {
       try {
-        const response = await api.get('/api/resources');
-        setResources(response.data);
+        await fetchResources();
       } catch (error) {
         console.error('Error fetching resources:', error);
       } finally {
@@ -20,22 +31,67 @@ const LibraryPage = () => {
       }
     };
 
-    fetchResources();
+    loadFirstPage();
   }, []);
 
-  const filteredResources = resources.filter(resource => {
-    const matchesSearch = resource.title.toLowerCase().includes(searchQuery.toLowerCase()) || 
-                          resource.description?.toLowerCase().includes(searchQuery.toLowerCase());
-    
-    const matchesCategory = categoryFilter === 'all' || resource.category === categoryFilter;
-    
-    return matchesSearch && matchesCategory;
-  });
+  const handleLoadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      await fetchResources(nextCursor);
+    } catch (error) {
+      console.error('Error fetching resources:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !nextCursor) return;
+
+    const observer = new IntersectionObserver(entries => {
+      if (entries[0].isIntersecting) handleLoadMore();
+    });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [nextCursor, loadingMore]);
+
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+
+    const timeout = setTimeout(async () => {
+      try {
+        const response = await api.get('/api/resources/search', {
+          params: {
+            q: query,
+            category: categoryFilter === 'all' ? undefined : categoryFilter
+          }
+        });
+        setSearchResults(response.data.resources);
+      } catch (error) {
+        console.error('Error searching resources:', error);
+      }
+    }, 250);
+
+    return () => clearTimeout(timeout);
+  }, [searchQuery, categoryFilter]);
+
+  const filteredResources = searchResults ?? resources.filter(resource =>
+    categoryFilter === 'all' || resource.category === categoryFilter
+  );
 
   const categories = [...new Set(resources.map(resource => resource.category))];
 
   const handleDelete = (deletedId) => {
     setResources(resources.filter(r => r.id !== deletedId));
+    if (searchResults) {
+      setSearchResults(searchResults.filter(r => r.id !== deletedId));
+    }
   };
 
   return (
@@ -90,6 +146,18 @@ const LibraryPage = () => {
           )}
         </div>
       )}
+
+      {!loading && !searchResults && nextCursor && (
+        <div className="load-more" ref={sentinelRef}>
+          <button
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+            className="btn btn-primary"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -4,9 +4,63 @@ import api from '../services/api';
 import { motion } from 'framer-motion';
 import FileUpload from '../components/FileUpload';
 
+// Files above this size go through a resumable upload session, so a dropped
+// connection only costs the chunk in flight.
+const SESSION_THRESHOLD = 8 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+
+const sessionKey = (file) => `upload-session:${file.name}:${file.size}:${file.lastModified}`;
+
+const uploadInSession = async (file, fields, onProgress) => {
+  const key = sessionKey(file);
+  let session = null;
+  const saved = localStorage.getItem(key);
+  if (saved) {
+    try {
+      session = (await api.get(`/api/upload-sessions/${saved}`)).data;
+    } catch (error) {
+      localStorage.removeItem(key);
+    }
+  }
+  if (!session) {
+    session = (await api.post('/api/upload-sessions', {
+      file_name: file.name,
+      file_size: file.size,
+      ...fields
+    })).data;
+    localStorage.setItem(key, session.id);
+  }
+
+  const received = (index) => session.received.some(
+    ([start, end]) => start <= index * session.chunk_size && index * session.chunk_size < end
+  );
+  for (let index = 0; index < session.chunk_count; index++) {
+    if (received(index)) continue;
+    const start = index * session.chunk_size;
+    const chunk = file.slice(start, Math.min(start + session.chunk_size, file.size));
+    for (let attempt = 1; ; attempt++) {
+      try {
+        await api.put(`/api/upload-sessions/${session.id}/chunks/${index}`, chunk, {
+          headers: { 'Content-Type': 'application/octet-stream' }
+        });
+        break;
+      } catch (error) {
+        if (attempt >= CHUNK_RETRIES || (error.response && error.response.status < 500)) throw error;
+        await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+      }
+    }
+    onProgress(Math.round(((index + 1) / session.chunk_count) * 100));
+  }
+
+  const response = await api.post(`/api/upload-sessions/${session.id}/complete`);
+  localStorage.removeItem(key);
+  return response;
+};
+
 const UploadPage = () => {
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [success, setSuccess] = useState(false);
   const navigate = useNavigate();
 
@@ -30,17 +84,21 @@ const UploadPage = () => {
     setUploading(true);
 
     try {
-      const formPayload = new FormData();
-      formPayload.append('file', file);
-      formPayload.append('title', formData.title);
-      formPayload.append('description', formData.description);
-      formPayload.append('category', formData.category);
+      if (file.size > SESSION_THRESHOLD) {
+        await uploadInSession(file, formData, setProgress);
+      } else {
+        const formPayload = new FormData();
+        formPayload.append('file', file);
+        formPayload.append('title', formData.title);
+        formPayload.append('description', formData.description);
+        formPayload.append('category', formData.category);
 
-      await api.post('/api/resources', formPayload, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
-      });
+        await api.post('/api/resources', formPayload, {
+          headers: {
+            'Content-Type': 'multipart/form-data'
+          }
+        });
+      }
 
       setSuccess(true);
       setTimeout(() => {
@@ -51,6 +109,7 @@ const UploadPage = () => {
       alert('Failed to upload resource. Please try again.');
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
@@ -136,7 +195,7 @@ const UploadPage = () => {
               disabled={uploading || !file}
               className="btn btn-primary upload-btn"
             >
-              {uploading ? 'Uploading...' : 'Share Resource'}
+              {uploading ? (progress === null ? 'Uploading...' : `Uploading... ${progress}%`) : 'Share Resource'}
             </motion.button>
           </form>
         </div>